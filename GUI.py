@@ -1,6 +1,5 @@
 import cv2
 import numpy as np
-from scipy.spatial import distance as dist
 import dlib
 from pygame import mixer
 import time
@@ -9,7 +8,19 @@ import os
 import sqlite3
 from tkinter import *
 from tkinter import ttk, messagebox
+from datetime import datetime
 from PIL import Image, ImageTk
+from session_events import SessionEventLog, INSERT_SQL as EVENT_INSERT_SQL, session_aggregates
+from session_stats import SessionStats
+import db
+import metrics
+import live_status
+from scoring import DrowsinessScorer, eye_aspect_ratio, mouth_aspect_ratio, EAR_THRESHOLD, MAR_THRESHOLD
+import landmarks
+import frame_governor
+import frame_bus
+from admin_queries import fetch_drivers_page, fetch_sessions_page
+from paged_view import PagedTreeLoader, ComboboxSearchLoader
 
 # Initialize mixer and load alarm sound
 mixer.init()
@@ -17,69 +28,14 @@ sound = mixer.Sound('alarm.wav') if os.path.exists('alarm.wav') else None
 
 # Initialize face detector and landmark predictor
 detector = dlib.get_frontal_face_detector()
-predictor = dlib.shape_predictor("shape_predictor_68_face_landmarks.dat")
+try:
+    predictor, LANDMARK_LAYOUT = landmarks.load_predictor()
+except FileNotFoundError as e:
+    print(f"Error: {e}")
+    exit()
 
 # Database setup
-def init_db():
-    with sqlite3.connect('drowsiness.db') as conn:
-        c = conn.cursor()
-        
-        c.execute('''CREATE TABLE IF NOT EXISTS users
-                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                     username TEXT UNIQUE,
-                     password TEXT,
-                     role TEXT,
-                     fullname TEXT,
-                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-        
-        c.execute('''CREATE TABLE IF NOT EXISTS sessions
-                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                     driver_id INTEGER,
-                     start_time TIMESTAMP,
-                     end_time TIMESTAMP,
-                     max_score INTEGER,
-                     avg_score REAL,
-                     FOREIGN KEY(driver_id) REFERENCES users(id))''')
-        
-        c.execute('''CREATE TABLE IF NOT EXISTS session_data
-                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                     session_id INTEGER,
-                     timestamp TIMESTAMP,
-                     score INTEGER,
-                     ear REAL,
-                     mar REAL,
-                     FOREIGN KEY(session_id) REFERENCES sessions(id))''')
-        
-        # Create admin if not exists
-        c.execute("SELECT * FROM users WHERE username='admin'")
-        if not c.fetchone():
-            c.execute("INSERT INTO users (username, password, role, fullname) VALUES (?, ?, ?, ?)",
-                     ('admin', 'admin123', 'admin', 'Administrator'))
-        conn.commit()
-
-init_db()
-
-# Drowsiness Detection Functions
-def eye_aspect_ratio(eye):
-    A = dist.euclidean(eye[1], eye[5])
-    B = dist.euclidean(eye[2], eye[4])
-    C = dist.euclidean(eye[0], eye[3])
-    return (A + B) / (2.0 * C) if C != 0 else 0
-
-def mouth_aspect_ratio(mouth):
-    # Calculate distances between key mouth points
-    A = dist.euclidean(mouth[0], mouth[6])  # Horizontal distance
-    
-    # Vertical distances
-    B1 = dist.euclidean(mouth[2], mouth[10])  # Top to bottom center
-    B2 = dist.euclidean(mouth[4], mouth[8])   # Midpoints
-    
-    # Additional vertical measurement
-    C = dist.euclidean(mouth[3], mouth[9])    # Center points
-    
-    # Combined mouth aspect ratio
-    mar = (B1 + B2 + C) / (3.0 * A) if A != 0 else 0
-    return mar
+db.init_db()
 
 def play_short_alarm():
     if sound:
@@ -87,16 +43,13 @@ def play_short_alarm():
         time.sleep(0.5)
         sound.stop()
 
-# Constants
-EAR_THRESHOLD = 0.25
-MAR_THRESHOLD = 0.85  # Increased threshold for better accuracy
-EAR_CONSEC_FRAMES = 20
-YAWN_CONSEC_FRAMES = 12  # Reduced frames for quicker yawn detection
-SCORE_THRESHOLD = 15
-ALARM_COOLDOWN = 2
-LEFT_EYE = list(range(36, 42))
-RIGHT_EYE = list(range(42, 48))
-MOUTH = list(range(48, 68))
+# Constants; scoring thresholds live in scoring.py
+LEFT_EYE = LANDMARK_LAYOUT['LEFT_EYE']
+RIGHT_EYE = LANDMARK_LAYOUT['RIGHT_EYE']
+MOUTH = LANDMARK_LAYOUT['MOUTH']
+# 'events' stores only state changes plus a heartbeat in session_events,
+# 'frames' additionally writes one session_data row per processed frame
+SESSION_STORAGE = 'events'
 
 class DrowsinessDetectionApp:
     def __init__(self, root):
@@ -106,8 +59,15 @@ class DrowsinessDetectionApp:
         self.current_user = None
         self.current_session_id = None
         self.detection_active = False
+        self.root.protocol('WM_DELETE_WINDOW', self.on_close)
         self.show_login_screen()
     
+    def on_close(self):
+        # Closing mid-detection must still end the session; an open one holds
+        # back the fleet_report / incremental_train watermark for a day
+        self.stop_detection()
+        self.root.destroy()
+    
     def clear_frame(self):
         for widget in self.root.winfo_children():
             widget.destroy()
@@ -140,7 +100,7 @@ class DrowsinessDetectionApp:
         password = self.password_entry.get()
         role = self.role_var.get()
         
-        with sqlite3.connect('drowsiness.db') as conn:
+        with db.connection() as conn:
             c = conn.cursor()
             c.execute("SELECT * FROM users WHERE username=? AND role=?", (username, role))
             user = c.fetchone()
@@ -195,9 +155,19 @@ class DrowsinessDetectionApp:
         
         Button(add_frame, text="Add Driver", command=self.add_driver).pack(pady=10)
         
+        # Driver Search
+        search_frame = Frame(driver_tab)
+        search_frame.grid(row=1, column=0, columnspan=2, pady=(10,0))
+        
+        Label(search_frame, text="Search:").pack(side=LEFT, padx=5)
+        self.driver_search_entry = Entry(search_frame)
+        self.driver_search_entry.pack(side=LEFT, padx=5)
+        self.driver_search_entry.bind('<Return>', lambda event: self.load_drivers())
+        Button(search_frame, text="Search", command=self.load_drivers).pack(side=LEFT, padx=5)
+        
         # Driver List with Remove Button
         list_frame = Frame(driver_tab)
-        list_frame.grid(row=1, column=0, columnspan=2, padx=10, pady=10)
+        list_frame.grid(row=2, column=0, columnspan=2, padx=10, pady=10)
         
         self.driver_tree = ttk.Treeview(list_frame, columns=('id', 'username', 'fullname'), show='headings')
         self.driver_tree.heading('id', text='ID')
@@ -207,11 +177,11 @@ class DrowsinessDetectionApp:
         
         scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=self.driver_tree.yview)
         scrollbar.pack(side=RIGHT, fill=Y)
-        self.driver_tree.configure(yscrollcommand=scrollbar.set)
+        self.driver_loader = PagedTreeLoader(self.root, self.driver_tree, scrollbar)
         
         # Remove Driver Button
         remove_frame = Frame(driver_tab)
-        remove_frame.grid(row=2, column=0, columnspan=2, pady=10)
+        remove_frame.grid(row=3, column=0, columnspan=2, pady=10)
         
         Button(remove_frame, text="Remove Selected Driver", command=self.remove_driver).pack()
         
@@ -227,11 +197,37 @@ class DrowsinessDetectionApp:
         self.driver_var = StringVar()
         self.driver_dropdown = ttk.Combobox(selection_frame, textvariable=self.driver_var)
         self.driver_dropdown.pack(side=LEFT, padx=5)
+        # Type part of a name to search; only the first page of matches is listed
+        self.driver_search = ComboboxSearchLoader(
+            self.root, self.driver_dropdown,
+            lambda conn, search: [f"{id} - {fullname}" for id, _, fullname
+                                  in fetch_drivers_page(conn, search=search)[0]])
         
         Button(selection_frame, text="Show Sessions", command=self.load_sessions).pack(side=LEFT, padx=5)
         
-        self.sessions_tree = ttk.Treeview(reports_tab, 
-                                        columns=('id', 'driver', 'start', 'end', 'max_score', 'avg_score', 'last_score'), 
+        # Session Filters (dates as YYYY-MM-DD, scores apply to max score)
+        filter_frame = Frame(reports_tab)
+        filter_frame.pack(fill=X, pady=5)
+        
+        Label(filter_frame, text="From:").pack(side=LEFT, padx=5)
+        self.session_from_entry = Entry(filter_frame, width=12)
+        self.session_from_entry.pack(side=LEFT)
+        Label(filter_frame, text="To:").pack(side=LEFT, padx=5)
+        self.session_to_entry = Entry(filter_frame, width=12)
+        self.session_to_entry.pack(side=LEFT)
+        Label(filter_frame, text="Min Score:").pack(side=LEFT, padx=5)
+        self.session_min_score_entry = Entry(filter_frame, width=6)
+        self.session_min_score_entry.pack(side=LEFT)
+        Label(filter_frame, text="Max Score:").pack(side=LEFT, padx=5)
+        self.session_max_score_entry = Entry(filter_frame, width=6)
+        self.session_max_score_entry.pack(side=LEFT)
+        
+        sessions_frame = Frame(reports_tab)
+        sessions_frame.pack(fill=BOTH, expand=True, padx=10, pady=10)
+        
+        self.sessions_tree = ttk.Treeview(sessions_frame, 
+                                        columns=('id', 'driver', 'start', 'end', 'max_score', 'avg_score', 'p95_score',
+                                                 'drowsy_seconds', 'alarm_count', 'last_score'), 
                                         show='headings')
         self.sessions_tree.heading('id', text='Session ID')
         self.sessions_tree.heading('driver', text='Driver')
@@ -239,6 +235,9 @@ class DrowsinessDetectionApp:
         self.sessions_tree.heading('end', text='End Time')
         self.sessions_tree.heading('max_score', text='Max Score')
         self.sessions_tree.heading('avg_score', text='Avg Score')
+        self.sessions_tree.heading('p95_score', text='P95 Score')
+        self.sessions_tree.heading('drowsy_seconds', text='Drowsy (s)')
+        self.sessions_tree.heading('alarm_count', text='Alarms')
         self.sessions_tree.heading('last_score', text='Last Score')
         
         self.sessions_tree.column('id', width=80)
@@ -247,9 +246,16 @@ class DrowsinessDetectionApp:
         self.sessions_tree.column('end', width=150)
         self.sessions_tree.column('max_score', width=80)
         self.sessions_tree.column('avg_score', width=80)
+        self.sessions_tree.column('p95_score', width=80)
+        self.sessions_tree.column('drowsy_seconds', width=80)
+        self.sessions_tree.column('alarm_count', width=60)
         self.sessions_tree.column('last_score', width=80)
         
-        self.sessions_tree.pack(fill=BOTH, expand=True, padx=10, pady=10)
+        self.sessions_tree.pack(side=LEFT, fill=BOTH, expand=True)
+        
+        sessions_scrollbar = ttk.Scrollbar(sessions_frame, orient="vertical", command=self.sessions_tree.yview)
+        sessions_scrollbar.pack(side=RIGHT, fill=Y)
+        self.sessions_loader = PagedTreeLoader(self.root, self.sessions_tree, sessions_scrollbar)
         
         self.load_driver_dropdown()
         
@@ -269,12 +275,14 @@ class DrowsinessDetectionApp:
             return
         
         try:
-            with sqlite3.connect('drowsiness.db') as conn:
+            with db.connection() as conn:
                 c = conn.cursor()
                 
                 # First delete related session data
                 c.execute("DELETE FROM session_data WHERE session_id IN (SELECT id FROM sessions WHERE driver_id = ?)", 
                           (driver_id,))
+                c.execute("DELETE FROM session_events WHERE session_id IN (SELECT id FROM sessions WHERE driver_id = ?)", 
+                          (driver_id,))
                 # Then delete sessions
                 c.execute("DELETE FROM sessions WHERE driver_id = ?", (driver_id,))
                 # Finally delete the driver
@@ -299,7 +307,7 @@ class DrowsinessDetectionApp:
             return
         
         try:
-            with sqlite3.connect('drowsiness.db') as conn:
+            with db.connection() as conn:
                 c = conn.cursor()
                 c.execute("INSERT INTO users (username, password, role, fullname) VALUES (?, ?, ?, ?)",
                          (username, password, 'driver', fullname))
@@ -314,22 +322,13 @@ class DrowsinessDetectionApp:
             messagebox.showerror("Error", "Username already exists")
     
     def load_drivers(self):
-        with sqlite3.connect('drowsiness.db') as conn:
-            c = conn.cursor()
-            for item in self.driver_tree.get_children():
-                self.driver_tree.delete(item)
-            c.execute("SELECT id, username, fullname FROM users WHERE role='driver'")
-            for row in c.fetchall():
-                self.driver_tree.insert('', 'end', values=row)
+        search = self.driver_search_entry.get().strip()
+        self.driver_loader.reset(
+            lambda conn, cursor: fetch_drivers_page(conn, cursor, search=search))
     
     def load_driver_dropdown(self):
-        with sqlite3.connect('drowsiness.db') as conn:
-            c = conn.cursor()
-            c.execute("SELECT id, fullname FROM users WHERE role='driver'")
-            drivers = c.fetchall()
-            self.driver_dropdown['values'] = [f"{id} - {name}" for id, name in drivers]
-            if drivers:
-                self.driver_var.set(self.driver_dropdown['values'][0])
+        self.driver_var.set('')  # Selects the first driver once loaded
+        self.driver_search.refresh()
     
     def load_sessions(self):
         driver_info = self.driver_var.get()
@@ -341,22 +340,31 @@ class DrowsinessDetectionApp:
         except (ValueError, IndexError):
             return
         
-        with sqlite3.connect('drowsiness.db') as conn:
-            c = conn.cursor()
-            for item in self.sessions_tree.get_children():
-                self.sessions_tree.delete(item)
-            
-            c.execute('''SELECT s.id, u.fullname, s.start_time, s.end_time, s.max_score, s.avg_score,
-                        (SELECT sd.score FROM session_data sd 
-                         WHERE sd.session_id = s.id 
-                         ORDER BY sd.timestamp DESC LIMIT 1) as last_score
-                        FROM sessions s 
-                        JOIN users u ON s.driver_id = u.id 
-                        WHERE s.driver_id=? 
-                        ORDER BY s.start_time DESC''', (driver_id,))
-            
-            for row in c.fetchall():
-                self.sessions_tree.insert('', 'end', values=row)
+        try:
+            filters = self.read_session_filters()
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid filter: {e}")
+            return
+        
+        self.sessions_loader.reset(
+            lambda conn, cursor: fetch_sessions_page(conn, driver_id, cursor, **filters))
+    
+    def read_session_filters(self):
+        date_from = self.session_from_entry.get().strip() or None
+        date_to = self.session_to_entry.get().strip() or None
+        min_score = self.session_min_score_entry.get().strip()
+        max_score = self.session_max_score_entry.get().strip()
+        
+        for value in (date_from, date_to):
+            if value:
+                datetime.strptime(value, '%Y-%m-%d')
+        
+        return {
+            'date_from': date_from,
+            'date_to': date_to,
+            'min_score': int(min_score) if min_score else None,
+            'max_score': int(max_score) if max_score else None,
+        }
     
     def show_driver_dashboard(self):
         self.clear_frame()
@@ -412,7 +420,7 @@ class DrowsinessDetectionApp:
         self.load_session_history()
     
     def load_session_history(self):
-        with sqlite3.connect('drowsiness.db') as conn:
+        with db.connection() as conn:
             c = conn.cursor()
             for item in self.session_tree.get_children():
                 self.session_tree.delete(item)
@@ -424,25 +432,42 @@ class DrowsinessDetectionApp:
     
     def start_detection(self):
         if not self.detection_active:
+            # Before the sessions row, so a missing camera or frame bus
+            # leaves no empty session behind
+            try:
+                cap = frame_bus.open_capture(0)
+            except OSError as e:
+                # TimeoutError when the frame bus capture process never appears
+                messagebox.showerror("Error", f"Could not open the camera: {e}")
+                return
+            if not cap.isOpened():
+                cap.release()
+                messagebox.showerror("Error", "Could not open the camera")
+                return
+            
             self.detection_active = True
             self.start_button.config(state=DISABLED)
             self.stop_button.config(state=NORMAL)
             
-            with sqlite3.connect('drowsiness.db') as conn:
+            with db.connection() as conn:
                 c = conn.cursor()
                 c.execute("INSERT INTO sessions (driver_id, start_time) VALUES (?, datetime('now'))", 
                          (self.current_user['id'],))
                 self.current_session_id = c.lastrowid
                 conn.commit()
             
-            self.cap = cv2.VideoCapture(0)
-            self.eye_frame_counter = 0
-            self.yawn_frame_counter = 0
+            self.cap = cap
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            self.last_frame_time = time.time()
+            self.governor = frame_governor.FrameRateGovernor(EAR_THRESHOLD, MAR_THRESHOLD)
+            self.scorer = DrowsinessScorer()
             self.score = 0
             self.last_alarm_time = 0
             self.avg_ear = 0.0
             self.avg_mar = 0.0
-            self.scores = []
+            self.event_log = SessionEventLog(self.current_session_id)
+            self.session_stats = SessionStats()
+            self.loop_metrics = metrics.LoopMetrics(self.cap)
             self.update_detection()
     
     def stop_detection(self):
@@ -457,16 +482,38 @@ class DrowsinessDetectionApp:
                 self.cap.release()
                 del self.cap
             
+            if hasattr(self, 'governor'):
+                self.governor.print_report()
+            
+            live_status.publish(self.current_user['username'],
+                                {'session_id': self.current_session_id, 'overall_status': "Stopped"})
+            
             if self.current_session_id:
-                with sqlite3.connect('drowsiness.db') as conn:
+                self.event_log.close(time.time(), self.score, self.avg_ear, self.avg_mar)
+                # Queued frame writes land before the session summary
+                db.get_writer().flush()
+                with db.connection() as conn:
+                    self.event_log.flush(conn)
+                    stats = self.session_stats.summary()
+                    # Drowsy time and alarms from the events, which cover no-face frames too
+                    aggregates = session_aggregates(conn, self.current_session_id)
                     c = conn.cursor()
-                    avg_score = sum(self.scores)/len(self.scores) if self.scores else 0
                     c.execute('''UPDATE sessions SET 
                                 end_time = datetime('now'),
                                 max_score = ?,
-                                avg_score = ?
+                                avg_score = ?,
+                                min_score = ?,
+                                score_stddev = ?,
+                                p50_score = ?,
+                                p95_score = ?,
+                                drowsy_seconds = ?,
+                                alarm_count = ?,
+                                frame_count = ?
                                 WHERE id = ?''',
-                             (max(self.scores) if self.scores else 0, avg_score, self.current_session_id))
+                             (stats['max_score'], stats['avg_score'], stats['min_score'],
+                              stats['score_stddev'], stats['p50_score'], stats['p95_score'],
+                              aggregates['drowsy_seconds'], aggregates['alarm_count'], stats['frame_count'],
+                              self.current_session_id))
                     conn.commit()
                 
                 if hasattr(self, 'session_tree') and self.session_tree.winfo_exists():
@@ -478,13 +525,29 @@ class DrowsinessDetectionApp:
             return
             
         try:
-            ret, frame = self.cap.read()
+            frame_started = time.time()
+            # frame comes back already in RGB for Tk, so colours below are RGB;
+            # on the frame bus that conversion is the only copy of the frame
+            # This runs on the Tk thread, so never wait here for a frame;
+            # root.after does the retrying
+            ret, gray, frame = frame_bus.read_frame(self.cap, 'rgb', timeout=0)
+            if ret is not None:
+                # None is only "no new frame yet" on the frame bus
+                self.loop_metrics.frame_read(ret)
             if not ret:
+                if time.time() - self.last_frame_time > frame_bus.READ_TIMEOUT:
+                    # Camera unplugged or the frame bus capture process died
+                    self.stop_detection()
+                    messagebox.showerror("Error", "The camera stopped sending frames; detection was stopped")
+                    return
                 self.root.after(10, self.update_detection)
                 return
+            self.last_frame_time = time.time()
+            metrics.CAPTURE_SECONDS.observe(self.last_frame_time - frame_started)
                 
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            stage_started = time.time()
             faces = detector(gray)
+            metrics.DETECT_SECONDS.observe(time.time() - stage_started)
             
             eye_status = "Open"
             mouth_status = "Closed"
@@ -492,8 +555,9 @@ class DrowsinessDetectionApp:
             
             if len(faces) > 0:
                 for face in faces:
+                    stage_started = time.time()
                     shape = predictor(gray, face)
-                    shape = np.array([[shape.part(i).x, shape.part(i).y] for i in range(68)])
+                    shape = landmarks.shape_to_np(shape)
                     
                     left_eye = shape[LEFT_EYE]
                     right_eye = shape[RIGHT_EYE]
@@ -504,63 +568,59 @@ class DrowsinessDetectionApp:
                     right_ear = eye_aspect_ratio(right_eye)
                     self.avg_ear = (left_ear + right_ear) / 2.0
                     self.avg_mar = mouth_aspect_ratio(mouth)
+                    metrics.LANDMARKS_SECONDS.observe(time.time() - stage_started)
                     
-                    # Draw landmarks with different colors for open/closed states
-                    eye_color = (0, 255, 0)  # Green for open eyes
-                    mouth_color = (0, 255, 0)  # Green for closed mouth
-                    
-                    # Eye status detection
-                    if self.avg_ear < EAR_THRESHOLD:
-                        self.eye_frame_counter += 1
-                        eye_status = "Closed"
-                        eye_color = (0, 0, 255)  # Red for closed eyes
-                    else:
-                        self.eye_frame_counter = max(0, self.eye_frame_counter - 1)
+                    # Eye/yawn counters, score and alarm cooldown
+                    current_time = time.time()
+                    eye_status, mouth_status, overall_status, alarm = self.scorer.update(
+                        current_time, self.avg_ear, self.avg_mar)
+                    self.score = self.scorer.score
                     
-                    # Enhanced mouth status detection
-                    if self.avg_mar > MAR_THRESHOLD:
-                        self.yawn_frame_counter += 1
-                        mouth_status = "Yawning"
-                        mouth_color = (0, 0, 255)  # Red for open mouth
-                        
+                    # Draw landmarks with different colors for open/closed states
+                    eye_color = (255, 0, 0) if eye_status == "Closed" else (0, 255, 0)
+                    mouth_color = (255, 0, 0) if mouth_status == "Yawning" else (0, 255, 0)
+                    if mouth_status == "Yawning":
                         # Additional visual feedback for yawning
-                        cv2.line(frame, tuple(mouth[2]), tuple(mouth[10]), (0, 0, 255), 2)
-                        cv2.line(frame, tuple(mouth[4]), tuple(mouth[8]), (0, 0, 255), 2)
-                    else:
-                        self.yawn_frame_counter = max(0, self.yawn_frame_counter - 1)
+                        cv2.line(frame, tuple(mouth[2]), tuple(mouth[10]), (255, 0, 0), 2)
+                        cv2.line(frame, tuple(mouth[4]), tuple(mouth[8]), (255, 0, 0), 2)
                     
                     # Draw landmarks with status-based colors
                     cv2.polylines(frame, [left_eye], True, eye_color, 1)
                     cv2.polylines(frame, [right_eye], True, eye_color, 1)
                     cv2.polylines(frame, [mouth], True, mouth_color, 1)
                     
-                    # Update score based on both eye and mouth status
-                    if eye_status == "Closed" and self.eye_frame_counter >= EAR_CONSEC_FRAMES:
-                        self.score += 1
-                    elif mouth_status == "Yawning" and self.yawn_frame_counter >= YAWN_CONSEC_FRAMES:
-                        self.score += 2  # Higher weight for yawning
-                    else:
-                        self.score = max(0, self.score - 1)
-                    
-                    self.scores.append(self.score)
-                    
-                    if self.score > SCORE_THRESHOLD:
-                        overall_status = "Drowsy"
-                    
-                    current_time = time.time()
-                    if overall_status == "Drowsy" and (current_time - self.last_alarm_time) > ALARM_COOLDOWN:
+                    self.session_stats.observe(self.score)
+                    if alarm:
                         threading.Thread(target=play_short_alarm, daemon=True).start()
                         self.last_alarm_time = current_time
+                        self.event_log.alarm(current_time, self.score, self.avg_ear, self.avg_mar)
+                        self.governor.note_alarm(current_time)
+                        metrics.ALARMS.inc()
                         cv2.putText(frame, "DROWSINESS ALERT!", (10, 30),
-                                   cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+                                   cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
             else:
-                self.score = max(0, self.score - 1)
-                self.eye_frame_counter = 0
-                self.yawn_frame_counter = 0
+                self.scorer.no_face()
+                self.score = self.scorer.score
                 self.avg_ear = 0.0
                 self.avg_mar = 0.0
             
+            self.event_log.update(time.time(), eye_status == "Closed", mouth_status == "Yawning",
+                                  overall_status == "Drowsy", self.score, self.avg_ear, self.avg_mar)
+            # Alarms are reported as a running count so coalesced updates cannot lose one
+            live_status.publish(self.current_user['username'], {
+                'session_id': self.current_session_id,
+                'eye_status': eye_status,
+                'mouth_status': mouth_status,
+                'overall_status': overall_status,
+                'ear': round(float(self.avg_ear), 3),
+                'mar': round(float(self.avg_mar), 3),
+                'score': self.score,
+                'alarm_count': self.event_log.alarm_count,
+                'last_alarm': self.last_alarm_time or None,
+            })
+            
             if self.video_label.winfo_exists():
+                stage_started = time.time()
                 eye_color = "red" if eye_status == "Closed" else "green"
                 mouth_color = "red" if mouth_status == "Yawning" else "green"
                 overall_color = "red" if overall_status == "Drowsy" else "green"
@@ -574,34 +634,44 @@ class DrowsinessDetectionApp:
                 if hasattr(self, 'score_label') and self.score_label.winfo_exists():
                     self.score_label.config(text=f"Score: {self.score}")
                 
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
                 img = Image.fromarray(frame)
                 imgtk = ImageTk.PhotoImage(image=img)
                 
                 self.video_label.imgtk = imgtk
                 self.video_label.configure(image=imgtk)
+                metrics.DISPLAY_SECONDS.observe(time.time() - stage_started)
                 
                 if self.current_session_id:
-                    with sqlite3.connect('drowsiness.db') as conn:
-                        c = conn.cursor()
-                        c.execute('''INSERT INTO session_data 
-                                    (session_id, timestamp, score, ear, mar) 
-                                    VALUES (?, datetime('now'), ?, ?, ?)''',
-                                 (self.current_session_id, self.score, self.avg_ear, self.avg_mar))
-                        conn.commit()
+                    # Queued for the writer thread; the frame loop never waits on SQLite
+                    stage_started = time.time()
+                    writer = db.get_writer()
+                    if SESSION_STORAGE == 'frames':
+                        # Stamped with the capture time, not whenever the writer commits
+                        writer.submit('''INSERT INTO session_data 
+                                        (session_id, timestamp, score, ear, mar) 
+                                        VALUES (?, datetime(?, 'unixepoch'), ?, ?, ?)''',
+                                      [(self.current_session_id, frame_started,
+                                        self.score, self.avg_ear, self.avg_mar)])
+                    writer.submit(EVENT_INSERT_SQL, self.event_log.take_pending())
+                    metrics.STORE_SECONDS.observe(time.time() - stage_started)
             
-            self.root.after(10, self.update_detection)
+            now = time.time()
+            self.loop_metrics.frame_done(now, len(faces) > 0, self.score, self.avg_ear, self.avg_mar,
+                                         now - frame_started)
+            self.governor.update(time.time(), self.score, self.avg_ear, self.avg_mar, len(faces) > 0)
+            self.root.after(self.governor.wait_ms(frame_started, minimum=10), self.update_detection)
         except Exception as e:
+            metrics.LOOP_ERRORS.inc()
             print(f"Error in update_detection: {e}")
             self.stop_detection()
 
 if __name__ == "__main__":
-    if not os.path.exists('shape_predictor_68_face_landmarks.dat'):
-        print("Error: Please download shape_predictor_68_face_landmarks.dat")
-        print("Download from: http://dlib.net/files/shape_predictor_68_face_landmarks.dat.bz2")
-        exit()
-    
+    frame_governor.configure_cpu_budget()
+    metrics.start_server()
+    live_status.start_server()
     root = Tk()
     app = DrowsinessDetectionApp(root)
     root.mainloop()
+    db.get_writer().close()
+    db.report_query_stats()
     
\ No newline at end of file
@@ -0,0 +1,69 @@
+PAGE_SIZE = 100
+
+# Keyset pagination: every page query seeks straight to the row after the
+# last one shown through an index, so the cost of a page does not depend on
+# how far the user has scrolled or how many rows the table holds.
+
+
+def fetch_drivers_page(conn, cursor=None, search='', limit=PAGE_SIZE):
+    """Return (rows, next_cursor); next_cursor is None on the last page."""
+    after_id = cursor or 0
+    sql = "SELECT id, username, fullname FROM users WHERE role='driver' AND id > ?"
+    params = [after_id]
+    if search:
+        sql += " AND (username LIKE ? OR fullname LIKE ?)"
+        pattern = f"%{search}%"
+        params += [pattern, pattern]
+    sql += " ORDER BY id LIMIT ?"
+    params.append(limit)
+
+    c = conn.cursor()
+    c.execute(sql, params)
+    rows = c.fetchall()
+    next_cursor = rows[-1][0] if len(rows) == limit else None
+    return rows, next_cursor
+
+
+def fetch_sessions_page(conn, driver_id, cursor=None, date_from=None, date_to=None,
+                        min_score=None, max_score=None, limit=PAGE_SIZE):
+    """Sessions newest first; the cursor is the (start_time, id) of the last row.
+
+    date_from/date_to are inclusive 'YYYY-MM-DD' dates and the score bounds
+    apply to max_score. Both are served by the sessions indexes on
+    (driver_id, start_time) and (driver_id, max_score).
+    """
+    sql = '''SELECT s.id, u.fullname, s.start_time, s.end_time, s.max_score, s.avg_score,
+                    s.p95_score, s.drowsy_seconds, s.alarm_count,
+                    COALESCE((SELECT sd.score FROM session_data sd
+                              WHERE sd.session_id = s.id
+                              ORDER BY sd.timestamp DESC LIMIT 1),
+                             (SELECT se.score FROM session_events se
+                              WHERE se.session_id = s.id
+                              ORDER BY se.timestamp DESC LIMIT 1)) as last_score
+             FROM sessions s
+             JOIN users u ON s.driver_id = u.id
+             WHERE s.driver_id = ?'''
+    params = [driver_id]
+    if cursor is not None:
+        sql += " AND (s.start_time, s.id) < (?, ?)"
+        params += list(cursor)
+    if date_from:
+        sql += " AND s.start_time >= ?"
+        params.append(date_from)
+    if date_to:
+        sql += " AND s.start_time < date(?, '+1 day')"
+        params.append(date_to)
+    if min_score is not None:
+        sql += " AND s.max_score >= ?"
+        params.append(min_score)
+    if max_score is not None:
+        sql += " AND s.max_score <= ?"
+        params.append(max_score)
+    sql += " ORDER BY s.start_time DESC, s.id DESC LIMIT ?"
+    params.append(limit)
+
+    c = conn.cursor()
+    c.execute(sql, params)
+    rows = c.fetchall()
+    next_cursor = (rows[-1][2], rows[-1][0]) if len(rows) == limit else None
+    return rows, next_cursor
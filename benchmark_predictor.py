@@ -0,0 +1,109 @@
+import argparse
+import multiprocessing
+import os
+import time
+
+import cv2
+import dlib
+import numpy as np
+
+import landmarks
+from train_eye_mouth_predictor import iter_images
+
+DATASET_PATH = "yawn_eye_dataset_new"
+MAX_IMAGES = 200
+REPEATS = 20  # Predictions timed per face
+
+
+def rss_kb():
+    # Resident set size from /proc (Linux); None elsewhere
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def collect_faces(dataset_path, max_images):
+    detector = dlib.get_frontal_face_detector()
+    faces = []
+    for image_path in iter_images(dataset_path):
+        gray = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            continue
+        found = detector(gray)
+        if len(found) > 0:
+            f = found[0]
+            faces.append((image_path, (f.left(), f.top(), f.right(), f.bottom())))
+        if len(faces) >= max_images:
+            break
+    return faces
+
+
+def profile_predictor(path, faces, repeats):
+    # Runs in a fresh process so load time and memory are not skewed by
+    # whichever model was loaded before it
+    images = [(cv2.imread(image_path, cv2.IMREAD_GRAYSCALE), dlib.rectangle(*box))
+              for image_path, box in faces]
+
+    rss_before = rss_kb()
+    start = time.perf_counter()
+    predictor, layout = landmarks.load_predictor(path)
+    load_seconds = time.perf_counter() - start
+    rss_after = rss_kb()
+
+    timings = []
+    for gray, rect in images:
+        predictor(gray, rect)  # warm-up
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            shape = predictor(gray, rect)
+            landmarks.shape_to_np(shape)
+            timings.append(time.perf_counter() - t0)
+
+    timings = np.array(timings) * 1e6
+    return {
+        'path': path,
+        'points': len(layout['LEFT_EYE']) + len(layout['RIGHT_EYE']) + len(layout['MOUTH']),
+        'file_mb': os.path.getsize(path) / 1e6,
+        'load_ms': load_seconds * 1000.0,
+        'rss_mb': (rss_after - rss_before) / 1024.0 if rss_before is not None else None,
+        'median_us': float(np.median(timings)) if len(timings) else None,
+        'p95_us': float(np.percentile(timings, 95)) if len(timings) else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare shape predictors on load time, memory and latency")
+    parser.add_argument('predictors', nargs='*',
+                        default=[landmarks.FULL_PREDICTOR_PATH, landmarks.EYE_MOUTH_PREDICTOR_PATH])
+    parser.add_argument('--dataset', default=DATASET_PATH)
+    parser.add_argument('--max-images', type=int, default=MAX_IMAGES)
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    args = parser.parse_args()
+
+    faces = collect_faces(args.dataset, args.max_images)
+    if not faces:
+        print(f"No faces found in {args.dataset}")
+        return
+    print(f"Benchmarking on {len(faces)} faces, {args.repeats} predictions each")
+
+    ctx = multiprocessing.get_context('spawn')
+    print(f"{'predictor':<40} {'points':>6} {'file MB':>8} {'load ms':>8} {'RSS MB':>8} "
+          f"{'median us':>10} {'p95 us':>8}")
+    for path in args.predictors:
+        if not os.path.exists(path):
+            print(f"{path:<40} missing")
+            continue
+        with ctx.Pool(1) as pool:
+            r = pool.apply(profile_predictor, (path, faces, args.repeats))
+        rss = f"{r['rss_mb']:8.1f}" if r['rss_mb'] is not None else f"{'-':>8}"
+        print(f"{r['path']:<40} {r['points']:>6} {r['file_mb']:8.1f} {r['load_ms']:8.1f} {rss} "
+              f"{r['median_us']:10.1f} {r['p95_us']:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,38 @@
 import os
+import argparse
 import cv2
 import dlib
 import numpy as np
 from scipy.spatial import distance as dist
 import pandas as pd
+from PIL import Image
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 import joblib
+import model_search
+import landmarks
 
 # Initialize face detector and landmark predictor
 detector = dlib.get_frontal_face_detector()
-predictor = dlib.shape_predictor("shape_predictor_68_face_landmarks.dat")
+predictor, LANDMARK_LAYOUT = landmarks.load_predictor()
+
+DATASET_PATH = "yawn_eye_dataset_new"
+FEATURES_PATH = 'drowsiness_features.npy'   # (n, 2) float32 EAR/MAR, memory-mapped
+LABELS_PATH = 'drowsiness_labels.npy'       # (n,) class names, '' where no face was found
+CSV_PATH = 'drowsiness_features.csv'
+CHUNK_SIZE = 256  # Images per feature chunk
+LABEL_DTYPE = '<U32'
+
+# Reduced decodes, largest reduction first. EAR and MAR are ratios, so they
+# come out the same at any scale as long as the face is still big enough for
+# the detector; MIN_DECODED_SIDE keeps the decoded image comfortably above
+# dlib's ~80px minimum face size.
+REDUCED_DECODES = [
+    (8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+    (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+    (2, cv2.IMREAD_REDUCED_GRAYSCALE_2),
+]
+MIN_DECODED_SIDE = 320
 
 def eye_aspect_ratio(eye):
     A = dist.euclidean(eye[1], eye[5])
@@ -26,9 +48,33 @@ def mouth_aspect_ratio(mouth):
     C = dist.euclidean(mouth[4], mouth[8])
     return (B + C) / (2.0 * A)
 
+def image_size(image_path):
+    # PIL only parses the header here, the pixels are never decoded
+    try:
+        with Image.open(image_path) as image:
+            return image.size
+    except OSError:
+        return 0, 0
+
+def read_gray(image_path):
+    width, height = image_size(image_path)
+    for factor, flag in REDUCED_DECODES:
+        if min(width, height) // factor >= MIN_DECODED_SIDE:
+            return cv2.imread(image_path, flag), factor
+    return cv2.imread(image_path, cv2.IMREAD_GRAYSCALE), 1
+
 def extract_features(image_path):
-    image = cv2.imread(image_path)
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    gray, factor = read_gray(image_path)
+    if gray is None:
+        return None
+    features = features_from_gray(gray)
+    if features is None and factor > 1:
+        # The reduced image lost the face; fall back to a full decode
+        gray = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+        features = features_from_gray(gray) if gray is not None else None
+    return features
+
+def features_from_gray(gray):
     faces = detector(gray)
     
     if len(faces) == 0:
@@ -37,11 +83,11 @@ def extract_features(image_path):
     features = []
     for face in faces:
         shape = predictor(gray, face)
-        shape = np.array([[shape.part(i).x, shape.part(i).y] for i in range(68)])
+        shape = landmarks.shape_to_np(shape)
         
         # Extract eye landmarks
-        left_eye = shape[36:42]
-        right_eye = shape[42:48]
+        left_eye = shape[LANDMARK_LAYOUT['LEFT_EYE']]
+        right_eye = shape[LANDMARK_LAYOUT['RIGHT_EYE']]
         
         # Calculate eye aspect ratios
         left_ear = eye_aspect_ratio(left_eye)
@@ -49,51 +95,118 @@ def extract_features(image_path):
         avg_ear = (left_ear + right_ear) / 2.0
         
         # Extract mouth landmarks
-        mouth = shape[48:68]
+        mouth = shape[LANDMARK_LAYOUT['MOUTH']]
         mar = mouth_aspect_ratio(mouth)
         
         features.append([avg_ear, mar])
     
     return features[0] if features else None
 
-def process_dataset(dataset_path):
-    data = []
-    labels = []
-    
-    for class_name in os.listdir(dataset_path):
+def iter_dataset(dataset_path):
+    for class_name in sorted(os.listdir(dataset_path)):
         class_path = os.path.join(dataset_path, class_name)
         if not os.path.isdir(class_path):
             continue
-            
-        for image_name in os.listdir(class_path):
-            image_path = os.path.join(class_path, image_name)
-            features = extract_features(image_path)
-            
-            if features is not None:
-                data.append(features)
-                labels.append(class_name)
-    
-    return np.array(data), np.array(labels)
+        for image_name in sorted(os.listdir(class_path)):
+            yield os.path.join(class_path, image_name), class_name
 
-# Path to your dataset
-dataset_path = "yawn_eye_dataset_new"
-X, y = process_dataset(dataset_path)
+def iter_feature_chunks(dataset_path, chunk_size=CHUNK_SIZE):
+    # Yields (features, labels) arrays of at most chunk_size images each;
+    # images without a face get NaN features and an empty label.
+    features = np.full((chunk_size, 2), np.nan, dtype=np.float32)
+    labels = np.full(chunk_size, '', dtype=LABEL_DTYPE)
+    n = 0
+    for image_path, class_name in iter_dataset(dataset_path):
+        result = extract_features(image_path)
+        if result is not None:
+            features[n] = result
+            labels[n] = class_name
+        n += 1
+        if n == chunk_size:
+            yield features, labels
+            features = np.full((chunk_size, 2), np.nan, dtype=np.float32)
+            labels = np.full(chunk_size, '', dtype=LABEL_DTYPE)
+            n = 0
+    if n:
+        yield features[:n], labels[:n]
 
-# Save the processed data
-df = pd.DataFrame(X, columns=['EAR', 'MAR'])
-df['label'] = y
-df.to_csv('drowsiness_features.csv', index=False)
+def process_dataset(dataset_path, features_path=FEATURES_PATH, labels_path=LABELS_PATH,
+                    csv_path=CSV_PATH):
+    # One row per image is preallocated on disk and filled chunk by chunk,
+    # so extraction never holds more than one chunk in Python memory.
+    total = sum(1 for _ in iter_dataset(dataset_path))
+    features = np.lib.format.open_memmap(features_path, mode='w+', dtype=np.float32, shape=(total, 2))
+    labels = np.lib.format.open_memmap(labels_path, mode='w+', dtype=LABEL_DTYPE, shape=(total,))
+    
+    offset = 0
+    header = True
+    for chunk_features, chunk_labels in iter_feature_chunks(dataset_path):
+        end = offset + len(chunk_labels)
+        features[offset:end] = chunk_features
+        labels[offset:end] = chunk_labels
+        offset = end
+        
+        found = chunk_labels != ''
+        df = pd.DataFrame(chunk_features[found], columns=['EAR', 'MAR'])
+        df['label'] = chunk_labels[found]
+        df.to_csv(csv_path, mode='w' if header else 'a', header=header, index=False)
+        header = False
+    
+    features.flush()
+    labels.flush()
+    del features, labels
+    return load_features(features_path, labels_path)
 
-# Split dataset
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+def load_features(features_path=FEATURES_PATH, labels_path=LABELS_PATH):
+    features = np.load(features_path, mmap_mode='r')
+    labels = np.load(labels_path, mmap_mode='r')
+    found = np.flatnonzero(labels != '')
+    return features[found], np.asarray(labels[found])
 
-# Train a classifier
-clf = RandomForestClassifier(n_estimators=100, random_state=42)
-clf.fit(X_train, y_train)
+def train_search(X, y):
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    
+    results, chosen, clf = model_search.run_search(X_train, y_train)
+    model_search.print_results(results, chosen)
+    
+    test_accuracy = clf.score(X_test, y_test)
+    print(f"Selected {chosen['family']} {chosen['params']}")
+    print("Test accuracy:", test_accuracy)
+    model_search.save_results(results, chosen, test_accuracy=test_accuracy)
+    
+    joblib.dump(clf, 'drowsiness_model.pkl')
 
-# Evaluate
-print("Train accuracy:", clf.score(X_train, y_train))
-print("Test accuracy:", clf.score(X_test, y_test))
+def main():
+    parser = argparse.ArgumentParser(description="Train the drowsiness classifier")
+    parser.add_argument('--search', action='store_true',
+                        help=f"compare the models in {model_search.SEARCH_CONFIG_PATH} instead of "
+                             "training the default random forest")
+    parser.add_argument('--reextract', action='store_true',
+                        help="re-extract features even if a cached copy exists")
+    args = parser.parse_args()
+    
+    if not args.reextract and os.path.exists(FEATURES_PATH) and os.path.exists(LABELS_PATH):
+        X, y = load_features()
+    else:
+        X, y = process_dataset(DATASET_PATH)
+    
+    if args.search:
+        train_search(X, y)
+        return
+    
+    # Split dataset
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    
+    # Train a classifier
+    clf = RandomForestClassifier(n_estimators=100, random_state=42)
+    clf.fit(X_train, y_train)
+    
+    # Evaluate
+    print("Train accuracy:", clf.score(X_train, y_train))
+    print("Test accuracy:", clf.score(X_test, y_test))
+    
+    # Save the model
+    joblib.dump(clf, 'drowsiness_model.pkl')
 
-# Save the model
-joblib.dump(clf, 'drowsiness_model.pkl')
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+from session_events import CREATE_TABLE_SQL as SESSION_EVENTS_SQL
+from session_stats import migrate_sessions_table
+
+DB_PATH = 'drowsiness.db'
+POOL_SIZE = 4               # Connections kept open and shared between threads
+STATEMENT_CACHE_SIZE = 256  # Prepared statements cached per connection
+BUSY_TIMEOUT = 5.0          # Seconds to wait on a locked database
+SLOW_QUERY_MS = 50.0        # Queries slower than this are printed
+WRITE_QUEUE_SIZE = 1000     # Writes the frame loop may queue before submit() blocks
+WRITE_RETRIES = 3           # Attempts per writer batch, e.g. while the database is locked
+WRITE_RETRY_DELAY = 0.5     # Seconds before a retry, times the attempt number
+STALE_SESSION_HOURS = 24    # Open sessions older than this are treated as abandoned
+
+# Applied to every new connection. WAL lets readers run alongside the frame
+# loop's writes and synchronous=NORMAL only fsyncs at checkpoints.
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+]
+
+
+# Query timing
+
+_stats_lock = threading.Lock()
+_query_stats = {}
+
+
+def _record_query(sql, elapsed):
+    key = ' '.join(sql.split())
+    ms = elapsed * 1000.0
+    with _stats_lock:
+        entry = _query_stats.get(key)
+        if entry is None:
+            entry = _query_stats[key] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+        entry['count'] += 1
+        entry['total_ms'] += ms
+        entry['max_ms'] = max(entry['max_ms'], ms)
+    if ms >= SLOW_QUERY_MS:
+        print(f"Slow query ({ms:.1f} ms): {key[:200]}")
+
+
+def query_stats():
+    with _stats_lock:
+        rows = [dict(sql=sql, **entry) for sql, entry in _query_stats.items()]
+    return sorted(rows, key=lambda r: r['total_ms'], reverse=True)
+
+
+def report_query_stats(limit=10):
+    for row in query_stats()[:limit]:
+        avg = row['total_ms'] / row['count']
+        print(f"{row['count']:8d} calls  {row['total_ms']:10.1f} ms total  "
+              f"{avg:8.2f} ms avg  {row['max_ms']:8.2f} ms max  {row['sql'][:80]}")
+
+
+class TimedCursor(sqlite3.Cursor):
+    # SELECTs run lazily, so fetches are timed against the statement too
+    _last_sql = None
+
+    def execute(self, sql, parameters=()):
+        self._last_sql = sql
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_query(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._last_sql = sql
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record_query(sql, time.perf_counter() - start)
+
+    def _timed_fetch(self, fetch, *args):
+        start = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            if self._last_sql is not None:
+                _record_query(self._last_sql, time.perf_counter() - start)
+
+    def fetchall(self):
+        return self._timed_fetch(super().fetchall)
+
+    def fetchmany(self, size=None):
+        if size is None:
+            return self._timed_fetch(super().fetchmany)
+        return self._timed_fetch(super().fetchmany, size)
+
+
+class TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# Connection pool
+
+class ConnectionPool:
+    def __init__(self, path=DB_PATH, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+
+    def _connect(self):
+        # Connections move between threads but are only ever held by one
+        # of them at a time, which is what check_same_thread guards against.
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE, factory=TimedConnection)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return self._idle.get()
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+def connection():
+    return get_pool().connection()
+
+
+# Background writer
+
+class BackgroundWriter:
+    """Applies writes queued by the frame loop on a worker thread.
+
+    submit() only queues; the worker drains whatever has queued up into one
+    transaction, so a slow disk backs up the queue instead of the camera.
+    A failed batch is rolled back and retried; if it keeps failing, each
+    write is tried on its own so one bad statement only loses its own rows.
+    """
+
+    def __init__(self, pool=None, maxsize=WRITE_QUEUE_SIZE):
+        self.pool = pool or get_pool()
+        self._queue = queue.Queue(maxsize)
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, sql, rows):
+        rows = list(rows)  # A failed batch is retried, so rows must be re-iterable
+        if rows:
+            self._queue.put((sql, rows))
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def flush(self):
+        # Wait until everything submitted so far is committed
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                writes = [item for item in items if item is not None]
+                if writes:
+                    self._write(writes)
+            except Exception as e:
+                # Keep the thread alive whatever happens; see _try_write
+                print(f"Error in database writer: {e}")
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+            if None in items:
+                return
+
+    def _write(self, writes):
+        for attempt in range(1, WRITE_RETRIES + 1):
+            if self._try_write(writes):
+                return
+            if attempt < WRITE_RETRIES:
+                time.sleep(WRITE_RETRY_DELAY * attempt)
+        for sql, rows in writes:
+            if len(writes) > 1 and self._try_write([(sql, rows)]):
+                continue
+            print(f"Dropped {len(rows)} queued rows: {' '.join(sql.split())[:80]}")
+
+    def _try_write(self, writes):
+        start = time.perf_counter()
+        try:
+            with self.pool.connection() as conn:
+                for sql, rows in writes:
+                    conn.executemany(sql, rows)
+        except Exception as e:
+            # Any exception: if this thread died, submit() would block once
+            # the queue filled and flush() would never return
+            metrics.DB_WRITE_ERRORS.inc()
+            print(f"Error in database writer: {e}")
+            return False
+        metrics.DB_WRITE_SECONDS.observe(time.perf_counter() - start)
+        return True
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = BackgroundWriter()
+            metrics.DB_QUEUE_DEPTH.set_function(_writer.depth)
+        return _writer
+
+
+# Versioned migrations, tracked in PRAGMA user_version
+
+def _create_base_tables(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS users
+                (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 username TEXT UNIQUE,
+                 password TEXT,
+                 role TEXT,
+                 fullname TEXT,
+                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS sessions
+                (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 driver_id INTEGER,
+                 start_time TIMESTAMP,
+                 end_time TIMESTAMP,
+                 max_score INTEGER,
+                 avg_score REAL,
+                 FOREIGN KEY(driver_id) REFERENCES users(id))''')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS session_data
+                (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 session_id INTEGER,
+                 timestamp TIMESTAMP,
+                 score INTEGER,
+                 ear REAL,
+                 mar REAL,
+                 FOREIGN KEY(session_id) REFERENCES sessions(id))''')
+
+    # Create admin if not exists
+    c.execute("SELECT * FROM users WHERE username='admin'")
+    if not c.fetchone():
+        c.execute("INSERT INTO users (username, password, role, fullname) VALUES (?, ?, ?, ?)",
+                  ('admin', 'admin123', 'admin', 'Administrator'))
+
+
+def _create_session_events(c):
+    c.execute(SESSION_EVENTS_SQL)
+
+
+def _create_indexes(c):
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_role ON users(role, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sessions_driver_start ON sessions(driver_id, start_time)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_session_data_session ON session_data(session_id, timestamp)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_session_events_session ON session_events(session_id, timestamp)")
+
+
+def _create_report_filter_indexes(c):
+    # Score filter of the admin session report; date filters use
+    # idx_sessions_driver_start
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sessions_driver_score ON sessions(driver_id, max_score)")
+
+
+# Append only; each step must also cope with databases created before
+# versioning existed, hence the IF NOT EXISTS / column checks.
+MIGRATIONS = [
+    (1, _create_base_tables),
+    (2, _create_session_events),
+    (3, migrate_sessions_table),
+    (4, _create_indexes),
+    (5, _create_report_filter_indexes),
+]
+
+
+def migrate(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, step in MIGRATIONS:
+        if target <= version:
+            continue
+        conn.execute("BEGIN")
+        try:
+            step(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {int(target)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version = target
+    return version
+
+
+def init_db():
+    with connection() as conn:
+        return migrate(conn)
+
+
+# Watermark shared by the batch jobs (fleet_report.py, incremental_train.py)
+
+def find_upper_bound(conn, watermark):
+    # Highest session id such that every session in (watermark, id] has ended
+    c = conn.cursor()
+    c.execute('''SELECT MIN(id) FROM sessions
+                 WHERE id > ? AND end_time IS NULL
+                 AND start_time > datetime('now', ?)''',
+              (watermark, f'-{STALE_SESSION_HOURS} hours'))
+    first_open = c.fetchone()[0]
+    if first_open is not None:
+        return first_open - 1
+    c.execute("SELECT MAX(id) FROM sessions")
+    last = c.fetchone()[0]
+    return last if last is not None else watermark
@@ -2,18 +2,33 @@ import cv2
 import numpy as np
 from scipy.spatial import distance as dist
 import dlib
+import pygame
 from pygame import mixer
 import time
 import threading
 import os       
+import landmarks
+import frame_governor
+import frame_bus
+import metrics
+import live_status
 
-# Initialize mixer and load alarm sound
-mixer.init()
-sound = mixer.Sound('alarm.wav')
+# Initialize mixer and load alarm sound. A headless unit (frame_bus.py
+# detect) may have no audio device; alarms are then only counted and logged.
+sound = None
+try:
+    mixer.init()
+    sound = mixer.Sound('alarm.wav')
+except (pygame.error, FileNotFoundError) as e:
+    print(f"Warning: alarm sound disabled: {e}")
 
 # Initialize face detector and landmark predictor
 detector = dlib.get_frontal_face_detector()
-predictor = dlib.shape_predictor("shape_predictor_68_face_landmarks.dat")
+try:
+    predictor, LANDMARK_LAYOUT = landmarks.load_predictor()
+except FileNotFoundError as e:
+    print(f"Error: {e}")
+    exit()
 
 def eye_aspect_ratio(eye):
     A = dist.euclidean(eye[1], eye[5])
@@ -32,9 +47,10 @@ def mouth_aspect_ratio(mouth):
     return mar
 
 def play_short_alarm():
-    sound.play()
-    time.sleep(0.5)
-    sound.stop()
+    if sound:
+        sound.play()
+        time.sleep(0.5)
+        sound.stop()
 
 # Constants
 EAR_THRESHOLD = 0.25  # Eye aspect ratio threshold
@@ -43,28 +59,41 @@ EAR_CONSEC_FRAMES = 20  # Frames for eye closure detection
 YAWN_CONSEC_FRAMES = 15  # Frames for yawn detection
 SCORE_THRESHOLD = 15    # Score threshold for alarm
 ALARM_COOLDOWN = 2      # Seconds between alarms
+LIVE_STREAM = 'local'   # Stream name on the live status service
 
 # Indexes for facial landmarks
-LEFT_EYE = list(range(36, 42))
-RIGHT_EYE = list(range(42, 48))
-MOUTH = list(range(48, 68))  # Mouth landmarks
+LEFT_EYE = LANDMARK_LAYOUT['LEFT_EYE']
+RIGHT_EYE = LANDMARK_LAYOUT['RIGHT_EYE']
+MOUTH = LANDMARK_LAYOUT['MOUTH']  # Mouth landmarks
 
-def detect_drowsiness():
-    cap = cv2.VideoCapture(0)
+def detect_drowsiness(cap=None, show=True):
+    # cap may be any object with read()/set()/release(), e.g. a FrameBusReader
+    if cap is None:
+        cap = frame_bus.open_capture(0)
+    # Keep the driver buffer short so a slowed-down loop still sees fresh frames
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    governor = frame_governor.FrameRateGovernor(EAR_THRESHOLD, MAR_THRESHOLD)
+    loop_metrics = metrics.LoopMetrics(cap)
     eye_frame_counter = 0
     yawn_frame_counter = 0
     score = 0
     last_alarm_time = 0
+    alarm_count = 0
     avg_ear = 0.0  # Default EAR value
     avg_mar = 0.0  # Default MAR value
     
     while True:
-        ret, frame = cap.read()
+        frame_started = time.time()
+        # Only copy the colour frame out of the frame bus when it gets drawn on
+        ret, gray, frame = frame_bus.read_frame(cap, 'bgr' if show else None)
+        loop_metrics.frame_read(ret)
+        metrics.CAPTURE_SECONDS.observe(time.time() - frame_started)
         if not ret:
             break
             
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        stage_started = time.time()
         faces = detector(gray)
+        metrics.DETECT_SECONDS.observe(time.time() - stage_started)
         
         # Default status
         eye_status = "Open"
@@ -74,8 +103,9 @@ def detect_drowsiness():
         # Process faces if detected
         if len(faces) > 0:
             for face in faces:
+                stage_started = time.time()
                 shape = predictor(gray, face)
-                shape = np.array([[shape.part(i).x, shape.part(i).y] for i in range(68)])
+                shape = landmarks.shape_to_np(shape)
                 
                 left_eye = shape[LEFT_EYE]
                 right_eye = shape[RIGHT_EYE]
@@ -86,11 +116,13 @@ def detect_drowsiness():
                 right_ear = eye_aspect_ratio(right_eye)
                 avg_ear = (left_ear + right_ear) / 2.0
                 avg_mar = mouth_aspect_ratio(mouth)
+                metrics.LANDMARKS_SECONDS.observe(time.time() - stage_started)
                 
                 # Draw landmarks
-                cv2.polylines(frame, [left_eye], True, (0, 255, 0), 1)
-                cv2.polylines(frame, [right_eye], True, (0, 255, 0), 1)
-                cv2.polylines(frame, [mouth], True, (0, 255, 0), 1)
+                if show:
+                    cv2.polylines(frame, [left_eye], True, (0, 255, 0), 1)
+                    cv2.polylines(frame, [right_eye], True, (0, 255, 0), 1)
+                    cv2.polylines(frame, [mouth], True, (0, 255, 0), 1)
                 
                 # Eye status detection
                 if avg_ear < EAR_THRESHOLD:
@@ -123,10 +155,14 @@ def detect_drowsiness():
                 # Trigger alarm if drowsy
                 current_time = time.time()
                 if overall_status == "Drowsy" and (current_time - last_alarm_time) > ALARM_COOLDOWN:
-                    cv2.putText(frame, "DROWSINESS ALERT!", (10, 30),
-                              cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+                    if show:
+                        cv2.putText(frame, "DROWSINESS ALERT!", (10, 30),
+                                  cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
                     threading.Thread(target=play_short_alarm, daemon=True).start()
                     last_alarm_time = current_time
+                    alarm_count += 1
+                    governor.note_alarm(current_time)
+                    metrics.ALARMS.inc()
         else:
             # No face detected - gradually decrease score
             score = max(0, score - 1)
@@ -135,44 +171,66 @@ def detect_drowsiness():
             avg_ear = 0.0
             avg_mar = 0.0
         
-        # Display information
-        status_color = (0, 255, 0) if overall_status == "Awake" else (0, 0, 255)
+        if show:
+            # Display information
+            status_color = (0, 255, 0) if overall_status == "Awake" else (0, 0, 255)
         
-        # Main status and score
-        cv2.putText(frame, f"Status: {overall_status}", (10, 30),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, status_color, 2)
-        cv2.putText(frame, f"Score: {score}", (10, 60),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, status_color, 2)
+            # Main status and score
+            cv2.putText(frame, f"Status: {overall_status}", (10, 30),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, status_color, 2)
+            cv2.putText(frame, f"Score: {score}", (10, 60),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, status_color, 2)
         
-        # Eye information
-        eye_color = (0, 255, 0) if eye_status == "Open" else (0, 0, 255)
-        cv2.putText(frame, f"Eye: {eye_status}", (10, 90),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, eye_color, 2)
-        cv2.putText(frame, f"EAR: {avg_ear:.2f}", (10, 120),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, eye_color, 2)
+            # Eye information
+            eye_color = (0, 255, 0) if eye_status == "Open" else (0, 0, 255)
+            cv2.putText(frame, f"Eye: {eye_status}", (10, 90),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, eye_color, 2)
+            cv2.putText(frame, f"EAR: {avg_ear:.2f}", (10, 120),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, eye_color, 2)
         
-        # Mouth information
-        mouth_color = (0, 255, 0) if mouth_status == "Closed" else (0, 0, 255)
-        cv2.putText(frame, f"Mouth: {mouth_status}", (10, 150),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, mouth_color, 2)
-        cv2.putText(frame, f"MAR: {avg_mar:.2f}", (10, 180),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, mouth_color, 2)
+            # Mouth information
+            mouth_color = (0, 255, 0) if mouth_status == "Closed" else (0, 0, 255)
+            cv2.putText(frame, f"Mouth: {mouth_status}", (10, 150),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, mouth_color, 2)
+            cv2.putText(frame, f"MAR: {avg_mar:.2f}", (10, 180),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, mouth_color, 2)
         
-        cv2.imshow('Drowsiness Detection', frame)
+        live_status.publish(LIVE_STREAM, {
+            'eye_status': eye_status,
+            'mouth_status': mouth_status,
+            'overall_status': overall_status,
+            'ear': round(float(avg_ear), 3),
+            'mar': round(float(avg_mar), 3),
+            'score': score,
+            'alarm_count': alarm_count,
+            'last_alarm': last_alarm_time or None,
+        })
         
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+        now = time.time()
+        loop_metrics.frame_done(now, len(faces) > 0, score, avg_ear, avg_mar, now - frame_started)
+        
+        # Slow down while the driver is clearly alert, full rate otherwise
+        governor.update(time.time(), score, avg_ear, avg_mar, len(faces) > 0)
+        if show:
+            stage_started = time.time()
+            cv2.imshow('Drowsiness Detection', frame)
+            metrics.DISPLAY_SECONDS.observe(time.time() - stage_started)
+            if cv2.waitKey(governor.wait_ms(frame_started)) & 0xFF == ord('q'):
+                break
+        else:
+            time.sleep(governor.wait_ms(frame_started) / 1000.0)
     
     cap.release()
-    cv2.destroyAllWindows()
+    if show:
+        cv2.destroyAllWindows()
+    governor.print_report()
 
 if __name__ == "__main__":
-    if not os.path.exists('shape_predictor_68_face_landmarks.dat'):
-        print("Error: Please download shape_predictor_68_face_landmarks.dat")
-        print("Download from: http://dlib.net/files/shape_predictor_68_face_landmarks.dat.bz2")
-        exit()
     if not os.path.exists('alarm.wav'):
         print("Warning: alarm.wav not found. Please add an audio file.")
     
+    frame_governor.configure_cpu_budget()
+    metrics.start_server()
+    live_status.start_server()
     detect_drowsiness()
    
\ No newline at end of file
@@ -6,13 +6,18 @@ from pygame import mixer
 import time
 import threading
 import os       
+import landmarks
 
 
 mixer.init()
 sound = mixer.Sound('alarm.wav')
 
 detector = dlib.get_frontal_face_detector()
-predictor = dlib.shape_predictor("shape_predictor_68_face_landmarks.dat")
+try:
+    predictor, LANDMARK_LAYOUT = landmarks.load_predictor()
+except FileNotFoundError as e:
+    print(f"Error: {e}")
+    exit()
 
 def eye_aspect_ratio(eye):
     A = dist.euclidean(eye[1], eye[5])
@@ -34,8 +39,8 @@ SCORE_THRESHOLD = 15
 ALARM_COOLDOWN = 2
 
 # Indexes for facial landmarks
-LEFT_EYE = list(range(36, 42))
-RIGHT_EYE = list(range(42, 48))
+LEFT_EYE = LANDMARK_LAYOUT['LEFT_EYE']
+RIGHT_EYE = LANDMARK_LAYOUT['RIGHT_EYE']
 
 def detect_drowsiness():
     cap = cv2.VideoCapture(0)
@@ -65,7 +70,7 @@ def detect_drowsiness():
         if len(faces) > 0:
             for face in faces:
                 shape = predictor(gray, face)
-                shape = np.array([[shape.part(i).x, shape.part(i).y] for i in range(68)])
+                shape = landmarks.shape_to_np(shape)
                 
                 left_eye = shape[LEFT_EYE]
                 right_eye = shape[RIGHT_EYE]
@@ -106,10 +111,6 @@ def detect_drowsiness():
     cv2.destroyAllWindows()
 
 if __name__ == "__main__":
-    if not os.path.exists('shape_predictor_68_face_landmarks.dat'):
-        print("Error: Please download shape_predictor_68_face_landmarks.dat")
-        print("Download from: http://dlib.net/files/shape_predictor_68_face_landmarks.dat.bz2")
-        exit()
     if not os.path.exists('alarm.wav'):
         print("Warning: alarm.wav not found. Please add an audio file.")
     
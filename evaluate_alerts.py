@@ -0,0 +1,348 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+
+import cv2
+import dlib
+import numpy as np
+
+import landmarks
+from frame_governor import FrameRateGovernor
+from scoring import DrowsinessScorer, eye_aspect_ratio, mouth_aspect_ratio
+
+CLIPS_DIR = 'eval_clips'
+CONFIGS_PATH = 'alert_configs.json'
+RESULTS_PATH = 'alert_evaluation.json'
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+EVENT_TYPES = ('drowsy', 'yawn')
+
+# An alert belongs to a labelled event if it sounds between ONSET_TOLERANCE
+# before the onset and ALERT_GRACE after its end; events labelled without
+# an end are given ALERT_WINDOW seconds. Every other alert is a false alarm.
+ONSET_TOLERANCE = 1.0
+ALERT_GRACE = 5.0
+ALERT_WINDOW = 30.0
+
+# Configuration keys that change what is computed per frame; clips are
+# processed once per distinct combination. All other keys go to
+# DrowsinessScorer, plus 'governor' to replay the frame rate governor.
+DEFAULT_EXTRACTION = {
+    'predictor': 'full',   # landmarks.PREDICTORS key or a .dat path
+    'detect_scale': 1.0,   # Downscale the frame for face detection only
+    'upsample': 0,         # dlib detector upsampling
+}
+SCORER_KEYS = ('ear_threshold', 'mar_threshold', 'ear_consec_frames', 'yawn_consec_frames',
+               'score_threshold', 'yawn_weight', 'alarm_cooldown')
+
+# Used when alert_configs.json is missing; same layout as the file
+DEFAULT_CONFIGS = {
+    # Replay at the measured processing speed, dropping frames like a live
+    # camera would, instead of scoring every frame of the clip
+    'realtime': True,
+    'configs': {'baseline': {}},
+}
+
+
+def load_configs(path=CONFIGS_PATH):
+    if not os.path.exists(path):
+        return DEFAULT_CONFIGS
+    with open(path) as f:
+        configs = json.load(f)
+    configs = {**DEFAULT_CONFIGS, **configs}
+    for name, config in configs['configs'].items():
+        unknown = set(config) - set(DEFAULT_EXTRACTION) - set(SCORER_KEYS) - {'governor'}
+        if unknown:
+            raise ValueError(f"Unknown keys in configuration '{name}': {', '.join(sorted(unknown))}")
+    return configs
+
+
+def split_config(config):
+    extraction = {key: config.get(key, value) for key, value in DEFAULT_EXTRACTION.items()}
+    scorer = {key: config[key] for key in SCORER_KEYS if key in config}
+    return extraction, scorer, bool(config.get('governor', False))
+
+
+def find_clips(clips_dir):
+    """Return [(clip_path, events)] for clips that have a label file.
+
+    Labels sit next to each clip as <clip>.json:
+        {"events": [{"type": "drowsy", "onset": 12.5, "end": 20.0},
+                    {"type": "yawn", "onset": 41.0}]}
+    An empty event list marks a clip with no drowsiness at all, which is
+    where false alarms are measured.
+    """
+    clips = []
+    for name in sorted(os.listdir(clips_dir)):
+        if not name.lower().endswith(VIDEO_EXTENSIONS):
+            continue
+        clip_path = os.path.join(clips_dir, name)
+        label_path = os.path.splitext(clip_path)[0] + '.json'
+        if not os.path.exists(label_path):
+            print(f"Warning: skipping {name}, no {os.path.basename(label_path)}")
+            continue
+        with open(label_path) as f:
+            events = json.load(f).get('events', [])
+        for event in events:
+            if event.get('type') not in EVENT_TYPES:
+                raise ValueError(f"{label_path}: event type must be one of {', '.join(EVENT_TYPES)}")
+        clips.append((clip_path, events))
+    return clips
+
+
+# Feature extraction, one worker process per clip
+
+_models = {}
+
+
+def _init_worker():
+    # Parallelism comes from the pool; OpenCV threads would only contend
+    cv2.setNumThreads(1)
+
+
+def _load_models(predictor_name):
+    if predictor_name not in _models:
+        path = landmarks.PREDICTORS.get(predictor_name, predictor_name)
+        predictor, layout = landmarks.load_predictor(path)
+        _models[predictor_name] = (dlib.get_frontal_face_detector(), predictor, layout)
+    return _models[predictor_name]
+
+
+def extract_clip(clip_path, extraction):
+    """Per-frame timestamp, EAR, MAR, face found and processing time."""
+    detector, predictor, layout = _load_models(extraction['predictor'])
+    scale = extraction['detect_scale']
+    cap = cv2.VideoCapture(clip_path)
+    video_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    rows = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        started = time.perf_counter()
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        small = gray if scale == 1.0 else cv2.resize(gray, None, fx=scale, fy=scale,
+                                                     interpolation=cv2.INTER_AREA)
+        faces = detector(small, extraction['upsample'])
+        ear = mar = 0.0
+        if len(faces) > 0:
+            # Clips show a single driver; the GUI scores every face it finds
+            face = faces[0]
+            if scale != 1.0:
+                face = dlib.rectangle(int(face.left() / scale), int(face.top() / scale),
+                                      int(face.right() / scale), int(face.bottom() / scale))
+            shape = landmarks.shape_to_np(predictor(gray, face))
+            ear = (eye_aspect_ratio(shape[layout['LEFT_EYE']])
+                   + eye_aspect_ratio(shape[layout['RIGHT_EYE']])) / 2.0
+            mar = mouth_aspect_ratio(shape[layout['MOUTH']])
+        rows.append((len(rows) / video_fps, ear, mar, len(faces) > 0, time.perf_counter() - started))
+    cap.release()
+
+    features = np.array(rows, dtype=[('time', 'f8'), ('ear', 'f8'), ('mar', 'f8'),
+                                     ('face', '?'), ('seconds', 'f8')])
+    return {
+        'frames': len(features),
+        'duration': len(features) / video_fps,
+        'processing_seconds': float(features['seconds'].sum()),
+        'features': features,
+    }
+
+
+def _extract_job(job):
+    clip_path, key = job
+    return clip_path, key, extract_clip(clip_path, dict(key))
+
+
+# Scoring
+
+def replay(features, scorer_params, realtime=True, governor=False):
+    """Run the scorer over a clip's features; returns (alarm times, frames scored).
+
+    In realtime mode each frame finishes its measured processing time after
+    it was captured, and the next frame scored is the newest one captured
+    by then, as with a one-frame camera buffer.
+    """
+    scorer = DrowsinessScorer(**scorer_params)
+    pacer = FrameRateGovernor(scorer.ear_threshold, scorer.mar_threshold, enabled=True) if governor else None
+    times = features['time']
+    alarms = []
+    scored = 0
+    clock = 0.0
+    i = 0
+    while i < len(features):
+        frame = features[i]
+        if realtime:
+            clock = max(clock, frame['time']) + frame['seconds']
+        else:
+            clock = frame['time']
+        if frame['face']:
+            alarm = scorer.update(clock, frame['ear'], frame['mar'])[3]
+            if alarm:
+                alarms.append(clock)
+        else:
+            scorer.no_face()
+        scored += 1
+
+        if pacer is not None:
+            pacer.update(clock, scorer.score, frame['ear'], frame['mar'], bool(frame['face']))
+            clock += max(0.0, pacer.interval - (frame['seconds'] if realtime else 0.0))
+        if realtime or pacer is not None:
+            i = max(i + 1, int(np.searchsorted(times, clock, side='right')) - 1)
+        else:
+            i += 1
+    return alarms, scored
+
+
+def match_alarms(alarms, events):
+    """Return ({event type: [latency or None per event]}, false alarm count)."""
+    windows = []
+    latencies = {event_type: [] for event_type in EVENT_TYPES}
+    for event in events:
+        onset = event['onset']
+        end = event.get('end', onset + ALERT_WINDOW)
+        start, stop = onset - ONSET_TOLERANCE, end + ALERT_GRACE
+        windows.append((start, stop))
+        hits = [alarm for alarm in alarms if start <= alarm <= stop]
+        latencies[event['type']].append(hits[0] - onset if hits else None)
+    false_alarms = sum(1 for alarm in alarms
+                       if not any(start <= alarm <= stop for start, stop in windows))
+    return latencies, false_alarms
+
+
+def latency_summary(latencies):
+    hits = np.array([latency for latency in latencies if latency is not None])
+    summary = {'events': len(latencies), 'alerted': len(hits), 'missed': len(latencies) - len(hits)}
+    if len(hits):
+        summary.update({
+            'mean': float(hits.mean()),
+            'min': float(hits.min()),
+            'p50': float(np.percentile(hits, 50)),
+            'p90': float(np.percentile(hits, 90)),
+            'p95': float(np.percentile(hits, 95)),
+            'max': float(hits.max()),
+        })
+    return summary
+
+
+def evaluate(clips, configs, realtime=True, jobs=None):
+    # Each clip is processed once per distinct extraction setting, in parallel
+    splits = {name: split_config(config) for name, config in configs.items()}
+    keys = {tuple(sorted(extraction.items())) for extraction, _, _ in splits.values()}
+    work = [(clip_path, key) for clip_path, _ in clips for key in sorted(keys)]
+
+    extracted = {}
+    with multiprocessing.Pool(jobs, initializer=_init_worker) as pool:
+        for done, (clip_path, key, result) in enumerate(pool.imap_unordered(_extract_job, work), 1):
+            extracted[clip_path, key] = result
+            print(f"[{done}/{len(work)}] {os.path.basename(clip_path)} {dict(key)}: "
+                  f"{result['frames'] / max(result['processing_seconds'], 1e-9):.1f} fps")
+
+    results = {}
+    for name, (extraction, scorer_params, governor) in splits.items():
+        key = tuple(sorted(extraction.items()))
+        latencies = {event_type: [] for event_type in EVENT_TYPES}
+        false_alarms = 0
+        frames = scored = 0
+        duration = processing = 0.0
+        per_clip = []
+        for clip_path, events in clips:
+            clip = extracted[clip_path, key]
+            alarms, clip_scored = replay(clip['features'], scorer_params, realtime, governor)
+            clip_latencies, clip_false = match_alarms(alarms, events)
+            for event_type in EVENT_TYPES:
+                latencies[event_type].extend(clip_latencies[event_type])
+            false_alarms += clip_false
+            frames += clip['frames']
+            scored += clip_scored
+            duration += clip['duration']
+            processing += clip['processing_seconds']
+            per_clip.append({'clip': os.path.basename(clip_path), 'alarms': alarms,
+                             'latencies': clip_latencies, 'false_alarms': clip_false})
+
+        hours = duration / 3600.0
+        results[name] = {
+            'config': configs[name],
+            'clips': len(clips),
+            'hours': hours,
+            # Throughput of detection + landmarks + ratios, decode excluded
+            'processing_fps': frames / processing if processing > 0 else 0.0,
+            # Frames actually scored per second of footage
+            'scored_fps': scored / duration if duration > 0 else 0.0,
+            'time_to_alert': {event_type: latency_summary(latencies[event_type])
+                              for event_type in EVENT_TYPES},
+            'false_alarms': false_alarms,
+            'false_alarms_per_hour': false_alarms / hours if hours > 0 else 0.0,
+            'per_clip': per_clip,
+        }
+    return results
+
+
+def print_results(results):
+    def latency(summary):
+        if not summary['alerted']:
+            return f"{summary['alerted']}/{summary['events']:<3} {'-':>6} {'-':>6}"
+        return f"{summary['alerted']}/{summary['events']:<3} {summary['p50']:6.2f} {summary['p95']:6.2f}"
+
+    print(f"{'configuration':<24} {'proc fps':>8} {'scored':>7}  {'drowsy hit  p50    p95':<23}  "
+          f"{'yawn hit    p50    p95':<23}  {'FA/h':>6}")
+    for name, r in results.items():
+        print(f"{name:<24} {r['processing_fps']:8.1f} {r['scored_fps']:7.1f}  "
+              f"{latency(r['time_to_alert']['drowsy']):<23}  {latency(r['time_to_alert']['yawn']):<23}  "
+              f"{r['false_alarms_per_hour']:6.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure alert latency and false alarms on labelled clips")
+    parser.add_argument('clips_dir', nargs='?', default=CLIPS_DIR)
+    parser.add_argument('--configs', default=CONFIGS_PATH)
+    parser.add_argument('--only', default='', help="comma separated configuration names")
+    parser.add_argument('--out', default=RESULTS_PATH)
+    parser.add_argument('--jobs', type=int, default=None,
+                        help="worker processes (default: all cores; use 1 for uncontended fps)")
+    parser.add_argument('--every-frame', action='store_true',
+                        help="score every frame instead of replaying at the measured speed")
+    args = parser.parse_args()
+
+    space = load_configs(args.configs)
+    configs = space['configs']
+    if args.only:
+        names = [name for name in args.only.split(',') if name]
+        unknown = [name for name in names if name not in configs]
+        if unknown:
+            print(f"Unknown configuration(s): {', '.join(unknown)}; "
+                  f"{args.configs} has: {', '.join(configs)}")
+            return
+        configs = {name: configs[name] for name in names}
+    realtime = space['realtime'] and not args.every_frame
+
+    clips = find_clips(args.clips_dir)
+    if not clips:
+        print(f"No labelled clips found in {args.clips_dir}")
+        return
+    # Configurations whose predictor is not on disk are skipped, not fatal
+    skipped = {}
+    for name, config in configs.items():
+        predictor = split_config(config)[0]['predictor']
+        if landmarks.missing_predictor_message(landmarks.PREDICTORS.get(predictor, predictor)):
+            skipped.setdefault(predictor, []).append(name)
+    for predictor, names in skipped.items():
+        message = landmarks.missing_predictor_message(landmarks.PREDICTORS.get(predictor, predictor))
+        print(f"Warning: skipping {', '.join(names)}: {message}")
+        for name in names:
+            del configs[name]
+    if not configs:
+        print("No configuration has its shape predictor available")
+        return
+
+    started = time.time()
+    results = evaluate(clips, configs, realtime, args.jobs)
+    print_results(results)
+    with open(args.out, 'w') as f:
+        json.dump({'realtime': realtime, 'clips_dir': args.clips_dir,
+                   'elapsed_seconds': time.time() - started, 'results': results}, f, indent=2)
+    print(f"Saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
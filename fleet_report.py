@@ -0,0 +1,196 @@
+import argparse
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import db
+from session_events import ALARM, HEARTBEAT, HEARTBEAT_INTERVAL
+
+CACHE_PATH = 'fleet_report_cache.json'
+REPORT_PATH = 'fleet_report.json'
+CHUNK_ROWS = 50000         # Rows pulled into pandas at a time
+WORST_SESSIONS = 20        # Sessions kept in the "worst sessions" list
+CACHE_VERSION = 1
+
+# Only sessions below the watermark are aggregated. The watermark stops at
+# the first session that is still running, so a re-run picks that session up
+# once it ends and never has to revisit anything it already counted.
+
+
+def empty_state():
+    return {'version': CACHE_VERSION, 'watermark': 0, 'drivers': {}, 'fleet': {},
+            'hour_of_day': {}, 'worst_sessions': []}
+
+
+def load_state(path):
+    if not os.path.exists(path):
+        return empty_state()
+    with open(path) as f:
+        state = json.load(f)
+    if state.get('version') != CACHE_VERSION:
+        return empty_state()
+    return state
+
+
+def save_state(state, path):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def _add_bucket(buckets, key, values):
+    bucket = buckets.setdefault(key, {})
+    for name, value in values.items():
+        bucket[name] = bucket.get(name, 0) + float(value)
+
+
+def aggregate_sessions(conn, state, lower, upper):
+    query = '''SELECT s.id, s.driver_id, u.fullname, s.start_time, s.end_time,
+                      s.max_score, s.p95_score, s.drowsy_seconds, s.alarm_count
+               FROM sessions s LEFT JOIN users u ON s.driver_id = u.id
+               WHERE s.id > ? AND s.id <= ? AND s.end_time IS NOT NULL
+               ORDER BY s.id'''
+    processed = 0
+    for df in pd.read_sql_query(query, conn, params=(lower, upper), chunksize=CHUNK_ROWS):
+        start = pd.to_datetime(df['start_time'], errors='coerce')
+        end = pd.to_datetime(df['end_time'], errors='coerce')
+        df['hours'] = ((end - start).dt.total_seconds() / 3600.0).clip(lower=0).fillna(0)
+        # Sessions from before the stats columns read back as all-NULL object columns
+        stats = ['max_score', 'p95_score', 'drowsy_seconds', 'alarm_count']
+        df[stats] = df[stats].apply(pd.to_numeric, errors='coerce')
+        df['drowsy_minutes'] = df['drowsy_seconds'].fillna(0) / 60.0
+        df['alarms'] = df['alarm_count'].fillna(0)
+        df['sessions'] = 1
+        df['week'] = start.dt.strftime('%G-W%V').fillna('unknown')
+        df['severity'] = df['p95_score'].fillna(df['max_score']).fillna(0)
+
+        columns = ['hours', 'drowsy_minutes', 'alarms', 'sessions']
+        per_driver = df.groupby(['driver_id', 'week'])[columns].sum()
+        for (driver_id, week), row in per_driver.iterrows():
+            driver = state['drivers'].setdefault(str(driver_id), {'name': None, 'weeks': {}})
+            _add_bucket(driver['weeks'], week, row.to_dict())
+        for driver_id, name in df[['driver_id', 'fullname']].drop_duplicates('driver_id').itertuples(index=False):
+            state['drivers'][str(driver_id)]['name'] = name
+
+        for week, row in df.groupby('week')[columns].sum().iterrows():
+            _add_bucket(state['fleet'], week, row.to_dict())
+
+        worst = df.nlargest(WORST_SESSIONS, 'severity')
+        candidates = state['worst_sessions'] + [
+            {'session_id': int(r.id), 'driver_id': int(r.driver_id), 'driver': r.fullname,
+             'start_time': r.start_time, 'hours': float(r.hours), 'severity': float(r.severity),
+             'max_score': None if pd.isna(r.max_score) else float(r.max_score),
+             'alarms': float(r.alarms)}
+            for r in worst.itertuples(index=False)]
+        candidates.sort(key=lambda s: s['severity'], reverse=True)
+        state['worst_sessions'] = candidates[:WORST_SESSIONS]
+        processed += len(df)
+    return processed
+
+
+def aggregate_events(conn, state, lower, upper):
+    # Each heartbeat's duration is the time driven since the previous one, so
+    # their sum per clock hour is the time actually driven in that hour. Rows
+    # written before heartbeats carried a duration count as one interval.
+    # Hours are local time; the offset is taken once, so sessions across a
+    # DST change shift by an hour.
+    offset = datetime.now(timezone.utc).astimezone().utcoffset().total_seconds()
+    query = '''SELECT timestamp, event, duration FROM session_events
+               WHERE session_id > ? AND session_id <= ? AND event IN (?, ?)'''
+    for df in pd.read_sql_query(query, conn, params=(lower, upper, HEARTBEAT, ALARM),
+                                chunksize=CHUNK_ROWS):
+        hours = ((df['timestamp'].to_numpy() + offset) // 3600 % 24).astype(np.int64)
+        is_alarm = (df['event'] == ALARM).to_numpy()
+        driven = df['duration'].fillna(HEARTBEAT_INTERVAL).to_numpy(dtype=float)
+        exposure = np.bincount(hours[~is_alarm], weights=driven[~is_alarm], minlength=24) / 3600.0
+        alarms = np.bincount(hours[is_alarm], minlength=24)
+        for hour in range(24):
+            if exposure[hour] or alarms[hour]:
+                _add_bucket(state['hour_of_day'], str(hour),
+                            {'hours': exposure[hour], 'alarms': alarms[hour]})
+
+
+def update_state(conn, state):
+    lower = state['watermark']
+    upper = db.find_upper_bound(conn, lower)
+    if upper <= lower:
+        return 0
+    processed = aggregate_sessions(conn, state, lower, upper)
+    aggregate_events(conn, state, lower, upper)
+    state['watermark'] = upper
+    return processed
+
+
+def _rates(bucket):
+    hours = bucket.get('hours', 0)
+    return {
+        'hours_driven': round(hours, 3),
+        'drowsy_minutes_per_hour': round(bucket.get('drowsy_minutes', 0) / hours, 3) if hours else None,
+        'alarms_per_hour': round(bucket.get('alarms', 0) / hours, 3) if hours else None,
+        'sessions': int(bucket.get('sessions', 0)),
+    }
+
+
+def build_report(state, active_driver_ids=None):
+    drivers = []
+    for driver_id, driver in sorted(state['drivers'].items(), key=lambda d: int(d[0])):
+        if active_driver_ids is not None and int(driver_id) not in active_driver_ids:
+            continue
+        weeks = [dict(week=week, **_rates(bucket)) for week, bucket in sorted(driver['weeks'].items())]
+        total = {}
+        for bucket in driver['weeks'].values():
+            for name, value in bucket.items():
+                total[name] = total.get(name, 0) + value
+        drivers.append({'driver_id': int(driver_id), 'name': driver['name'],
+                        'overall': _rates(total), 'weeks': weeks})
+
+    return {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'watermark': state['watermark'],
+        'fleet_weekly': [dict(week=week, **_rates(bucket)) for week, bucket in sorted(state['fleet'].items())],
+        'alarm_rate_by_hour': [
+            {'hour': int(hour), 'hours_driven': round(bucket['hours'], 3),
+             'alarms': int(bucket['alarms']),
+             'alarms_per_hour': round(bucket['alarms'] / bucket['hours'], 3) if bucket['hours'] else None}
+            for hour, bucket in sorted(state['hour_of_day'].items(), key=lambda h: int(h[0]))],
+        'drivers': drivers,
+        'worst_sessions': [s for s in state['worst_sessions']
+                           if active_driver_ids is None or s['driver_id'] in active_driver_ids],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fleet drowsiness analytics over recorded sessions")
+    parser.add_argument('--db', default=db.DB_PATH)
+    parser.add_argument('--cache', default=CACHE_PATH)
+    parser.add_argument('--out', default=REPORT_PATH)
+    parser.add_argument('--full', action='store_true', help="ignore the cache and reprocess every session")
+    args = parser.parse_args()
+
+    state = empty_state() if args.full else load_state(args.cache)
+    pool = db.ConnectionPool(args.db, size=1)
+    with pool.connection() as conn:
+        # Older databases lack the stats columns and session_events
+        db.migrate(conn)
+        processed = update_state(conn, state)
+        active = {row[0] for row in conn.execute("SELECT id FROM users WHERE role='driver'")}
+    pool.close()
+    save_state(state, args.cache)
+
+    report = build_report(state, active)
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"Processed {processed} new sessions (watermark {state['watermark']})")
+    for row in report['fleet_weekly'][-8:]:
+        print(f"{row['week']}: {row['hours_driven']:.1f} h driven, "
+              f"{row['drowsy_minutes_per_hour']} drowsy min/h, {row['alarms_per_hour']} alarms/h")
+    print(f"Report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+import argparse
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+DEFAULT_BUS_NAME = 'drowsiness_frames'
+DEFAULT_SLOTS = 8
+ATTACH_TIMEOUT = 10.0   # Seconds a consumer waits for the capture process
+READ_TIMEOUT = 2.0      # Seconds read() waits for a new frame before giving up
+POLL_INTERVAL = 0.001
+
+# Set to a bus name to make open_capture() read from the bus instead of a camera
+FRAME_BUS_ENV = 'DROWSINESS_FRAME_BUS'
+
+# Shared memory layout: an int64 header, then per-slot sequence numbers and
+# capture timestamps, then the frames themselves.
+MAGIC = 0x44524f5753590001
+H_MAGIC, H_SLOTS, H_HEIGHT, H_WIDTH, H_CHANNELS, H_LATEST, H_CLOSED = range(7)
+HEADER_FIELDS = 8
+
+
+def _layout(slots, height, width, channels):
+    header = HEADER_FIELDS * 8
+    seqs = slots * 8
+    stamps = slots * 8
+    frame_bytes = height * width * channels
+    return header, seqs, stamps, frame_bytes, header + seqs + stamps + slots * frame_bytes
+
+
+def _views(buf, slots, height, width, channels):
+    header, seqs, stamps, frame_bytes, _ = _layout(slots, height, width, channels)
+    return (np.ndarray((HEADER_FIELDS,), np.int64, buf, 0),
+            np.ndarray((slots,), np.int64, buf, header),
+            np.ndarray((slots,), np.float64, buf, header + seqs),
+            np.ndarray((slots, height, width, channels), np.uint8, buf, header + seqs + stamps))
+
+
+def _attach(name):
+    # Consumers must not unlink the block when they exit; before Python 3.13
+    # the resource tracker does exactly that unless told otherwise
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class FrameBusWriter:
+    """Single producer side of the ring buffer.
+
+    Each slot carries the sequence number of the frame in it. While a slot
+    is being rewritten its sequence is set to -1, so a reader that sees the
+    same sequence before and after using a frame knows it was not torn.
+    """
+
+    def __init__(self, shape, name=DEFAULT_BUS_NAME, slots=DEFAULT_SLOTS):
+        height, width = shape[:2]
+        channels = shape[2] if len(shape) > 2 else 1
+        size = _layout(slots, height, width, channels)[-1]
+        try:
+            # A previous capture process that crashed leaves its block behind
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.name = name
+        self.slots = slots
+        self.header, self.seqs, self.stamps, self.frames = _views(self.shm.buf, slots, height, width, channels)
+        self.seqs[:] = 0
+        self.header[:] = 0
+        self.header[H_SLOTS] = slots
+        self.header[H_HEIGHT] = height
+        self.header[H_WIDTH] = width
+        self.header[H_CHANNELS] = channels
+        self.header[H_MAGIC] = MAGIC  # Written last: readers wait for it
+        self.seq = 0
+        self.started = time.time()
+
+    def write(self, frame):
+        self.seq += 1
+        slot = self.seq % self.slots
+        self.seqs[slot] = -1
+        self.frames[slot] = frame.reshape(self.frames.shape[1:])
+        self.stamps[slot] = time.time()
+        self.seqs[slot] = self.seq
+        self.header[H_LATEST] = self.seq
+        return self.seq
+
+    def stats(self):
+        elapsed = time.time() - self.started
+        return {'frames_written': self.seq, 'fps': self.seq / elapsed if elapsed > 0 else 0.0}
+
+    def close(self):
+        self.header[H_CLOSED] = 1
+        del self.header, self.seqs, self.stamps, self.frames
+        self.shm.close()
+        self.shm.unlink()
+
+
+class FrameBusReader:
+    """Consumer side; also usable wherever a cv2.VideoCapture is expected.
+
+    read_latest() hands out a read-only view straight into shared memory.
+    The view stays valid until the writer comes round the ring again, which
+    is_valid() checks; read() copies, for callers that draw on the frame.
+    read_frame() below converts from the view and copies only what is used.
+    """
+
+    def __init__(self, name=DEFAULT_BUS_NAME, timeout=ATTACH_TIMEOUT):
+        deadline = time.time() + timeout
+        while True:
+            try:
+                self.shm = _attach(name)
+                header = np.ndarray((HEADER_FIELDS,), np.int64, self.shm.buf, 0)
+                if header[H_MAGIC] == MAGIC:
+                    break
+                del header
+                self.shm.close()
+            except FileNotFoundError:
+                pass
+            if time.time() > deadline:
+                raise TimeoutError(f"Frame bus '{name}' did not appear within {timeout}s")
+            time.sleep(0.05)
+
+        slots, height, width, channels = (int(header[i]) for i in (H_SLOTS, H_HEIGHT, H_WIDTH, H_CHANNELS))
+        del header
+        self.header, self.seqs, self.stamps, self.frames = _views(self.shm.buf, slots, height, width, channels)
+        self.slots = slots
+        self.shape = (height, width, channels) if channels > 1 else (height, width)
+        self.last_seq = 0
+        self.frames_read = 0
+        self.frames_skipped = 0   # Newer frames arrived before we asked again
+        self.overruns = 0         # Frames overwritten while we held them
+        self.latency_total = 0.0  # Capture-to-read delay
+        self.started = time.time()
+
+    @property
+    def closed(self):
+        return bool(self.header[H_CLOSED])
+
+    def read_latest(self, timeout=READ_TIMEOUT):
+        """Return (seq, frame view) for the newest unseen frame, or (None, None)."""
+        deadline = time.time() + timeout
+        while True:
+            seq = int(self.header[H_LATEST])
+            if seq > self.last_seq:
+                slot = seq % self.slots
+                if self.seqs[slot] == seq:
+                    break
+                # Writer lapped us between the two loads; try the new latest
+                continue
+            if self.closed or time.time() > deadline:
+                return None, None
+            time.sleep(POLL_INTERVAL)
+
+        if self.last_seq:
+            self.frames_skipped += seq - self.last_seq - 1
+        self.last_seq = seq
+        self.frames_read += 1
+        self.latency_total += time.time() - self.stamps[slot]
+        frame = self.frames[slot].reshape(self.shape)
+        frame.flags.writeable = False
+        return seq, frame
+
+    def is_valid(self, seq):
+        # False once the writer has started reusing this frame's slot
+        valid = self.seqs[seq % self.slots] == seq
+        if not valid:
+            self.overruns += 1
+        return valid
+
+    # cv2.VideoCapture compatible interface
+
+    def read(self):
+        while True:
+            seq, frame = self.read_latest()
+            if seq is None:
+                return False, None
+            copy = frame.copy()
+            if self.is_valid(seq):
+                return True, copy
+
+    def isOpened(self):
+        return not self.closed
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        del self.header, self.seqs, self.stamps, self.frames
+        try:
+            self.shm.close()
+        except BufferError:
+            # A caller still holds a frame view; the mapping goes with the process
+            pass
+
+    def stats(self):
+        elapsed = time.time() - self.started
+        return {
+            'frames_read': self.frames_read,
+            'fps': self.frames_read / elapsed if elapsed > 0 else 0.0,
+            'frames_skipped': self.frames_skipped,
+            'overruns': self.overruns,
+            'avg_latency_ms': 1000.0 * self.latency_total / self.frames_read if self.frames_read else 0.0,
+        }
+
+
+def open_capture(source=0):
+    name = os.environ.get(FRAME_BUS_ENV)
+    if name:
+        return FrameBusReader(name)
+    return cv2.VideoCapture(source)
+
+
+def read_frame(cap, color=None, timeout=READ_TIMEOUT):
+    """Read one frame from a cv2.VideoCapture or FrameBusReader.
+
+    Returns (ok, gray, frame). On the frame bus gray is converted straight
+    from the shared-memory view, and the colour frame is only copied out
+    when asked for: color='bgr' for a copy to draw on, 'rgb' to convert for
+    display, None for no colour frame (frame is then None). timeout only
+    applies to the frame bus; ok is None when no new frame arrived in time
+    but the bus is still open, False once it is closed.
+    """
+    if not isinstance(cap, FrameBusReader):
+        ret, frame = cap.read()
+        if not ret:
+            return False, None, None
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if color == 'rgb':
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        return True, gray, frame if color else None
+
+    while True:
+        seq, view = cap.read_latest(timeout)
+        if seq is None:
+            return (False if cap.closed else None), None, None
+        gray = view.copy() if view.ndim == 2 else cv2.cvtColor(view, cv2.COLOR_BGR2GRAY)
+        if color == 'rgb':
+            frame = cv2.cvtColor(view, cv2.COLOR_BGR2RGB)
+        elif color:
+            frame = view.copy()
+        else:
+            frame = None
+        if cap.is_valid(seq):
+            return True, gray, frame
+
+
+def print_stats(role, stats):
+    print(f"[{role}] " + "  ".join(
+        f"{key}={value:.1f}" if isinstance(value, float) else f"{key}={value}"
+        for key, value in stats.items()))
+
+
+# Processes
+
+def run_capture(source, name=DEFAULT_BUS_NAME, slots=DEFAULT_SLOTS, stop_event=None, loop=False):
+    """Capture frames from a camera index or video file into the bus."""
+    cap = cv2.VideoCapture(source)
+    ret, frame = cap.read()
+    if not ret:
+        print(f"[capture] could not read from {source}")
+        return
+    # Video files are paced at their own frame rate so they behave like a camera
+    is_file = isinstance(source, str) and not source.isdigit()
+    frame_interval = 1.0 / (cap.get(cv2.CAP_PROP_FPS) or 30.0) if is_file else 0.0
+
+    writer = FrameBusWriter(frame.shape, name, slots)
+    next_time = time.time()
+    try:
+        while stop_event is None or not stop_event.is_set():
+            writer.write(frame)
+            if frame_interval:
+                next_time += frame_interval
+                time.sleep(max(0.0, next_time - time.time()))
+            ret, frame = cap.read()
+            if not ret:
+                if not (loop and is_file):
+                    break
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = cap.read()
+                if not ret:
+                    break
+    finally:
+        print_stats('capture', writer.stats())
+        cap.release()
+        writer.close()
+
+
+def run_recorder(name=DEFAULT_BUS_NAME, output='recording.avi', fps=30.0):
+    reader = FrameBusReader(name)
+    height, width = reader.shape[:2]
+    out = cv2.VideoWriter(output, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    try:
+        while True:
+            seq, frame = reader.read_latest()
+            if seq is None:
+                break
+            out.write(frame)  # Encodes straight from shared memory
+            reader.is_valid(seq)
+    finally:
+        print_stats('recorder', reader.stats())
+        out.release()
+        reader.release()
+
+
+def run_display(name=DEFAULT_BUS_NAME):
+    reader = FrameBusReader(name)
+    try:
+        while True:
+            seq, frame = reader.read_latest()
+            if seq is None:
+                break
+            cv2.imshow('Frame Bus', frame)
+            reader.is_valid(seq)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+    finally:
+        print_stats('display', reader.stats())
+        cv2.destroyAllWindows()
+        reader.release()
+
+
+def run_detection(name=DEFAULT_BUS_NAME, show=False):
+    # Imported here: drowiness_yawn loads the landmark model and audio at import
+    import drowiness_yawn
+    import metrics
+    import live_status
+    metrics.start_server()
+    live_status.start_server()
+    reader = FrameBusReader(name)
+    try:
+        drowiness_yawn.detect_drowsiness(cap=reader, show=show)
+    finally:
+        print_stats('detection', reader.stats())
+
+
+CONSUMERS = {'detect': run_detection, 'record': run_recorder, 'display': run_display}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Share one camera or video file between several processes")
+    parser.add_argument('--source', default='0', help="camera index or video file")
+    parser.add_argument('--name', default=DEFAULT_BUS_NAME)
+    parser.add_argument('--slots', type=int, default=DEFAULT_SLOTS)
+    parser.add_argument('--consumers', default='detect,record',
+                        help=f"comma separated, any of {', '.join(CONSUMERS)}")
+    parser.add_argument('--loop', action='store_true', help="loop a video file until interrupted")
+    args = parser.parse_args()
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    stop_event = multiprocessing.Event()
+    capture = multiprocessing.Process(target=run_capture,
+                                      args=(source, args.name, args.slots, stop_event, args.loop))
+    capture.start()
+    consumers = [multiprocessing.Process(target=CONSUMERS[role], args=(args.name,))
+                 for role in args.consumers.split(',') if role]
+    for process in consumers:
+        process.start()
+    try:
+        capture.join()
+    except KeyboardInterrupt:
+        stop_event.set()
+        capture.join()
+    for process in consumers:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
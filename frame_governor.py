@@ -0,0 +1,145 @@
+import os
+import time
+
+import cv2
+
+# Processing interval bounds in seconds: MIN is "as fast as frames arrive",
+# MAX is the slowest the loop may get while the driver is clearly alert.
+MIN_INTERVAL = 0.0
+MAX_INTERVAL = 0.5
+RELAX_FACTOR = 1.25    # Interval growth per calm frame once relaxing
+RELAX_START = 0.05     # First non-zero interval when starting to relax
+CALM_FRAMES = 30       # Consecutive calm frames before slowing down
+LOW_SCORE = 2          # Scores at or below this count as calm
+EAR_MARGIN = 0.05      # EAR must sit this far above the threshold to be calm
+EAR_SMOOTHING = 0.3    # EWMA weight of the newest EAR slope sample
+EAR_DROP_RATE = 0.05   # EAR falling faster than this per second is a risk sign
+
+# Environment overrides for in-cab units
+GOVERNOR_ENV = 'DROWSINESS_GOVERNOR'    # '0' runs every frame at full rate
+THREADS_ENV = 'DROWSINESS_CPU_THREADS'  # OpenCV worker threads
+CPUS_ENV = 'DROWSINESS_CPUS'            # e.g. '0,1' to pin to those cores
+
+
+def configure_cpu_budget(threads=None, cpus=None):
+    """Cap OpenCV threads and optionally pin the process to a set of CPUs.
+
+    dlib's HOG detector and shape predictor run on the calling thread, so
+    the thread cap mainly stops OpenCV from fanning colour conversion and
+    drawing out over every core; pinning bounds everything else.
+    """
+    if threads is None and os.environ.get(THREADS_ENV):
+        threads = int(os.environ[THREADS_ENV])
+    if cpus is None and os.environ.get(CPUS_ENV):
+        cpus = [int(cpu) for cpu in os.environ[CPUS_ENV].split(',')]
+
+    if threads is not None:
+        cv2.setNumThreads(threads)
+    if cpus:
+        if hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, cpus)
+        else:
+            print("Warning: CPU pinning is not supported on this platform")
+
+
+class FrameRateGovernor:
+    """Chooses how long to wait before processing the next frame.
+
+    Any sign of risk (score above LOW_SCORE, EAR near the threshold or
+    trending down, MAR above the yawn threshold, no face) snaps straight back to full rate; only a long
+    calm stretch lets the interval grow towards MAX_INTERVAL.
+    """
+
+    def __init__(self, ear_threshold, mar_threshold, min_interval=MIN_INTERVAL,
+                 max_interval=MAX_INTERVAL, enabled=None):
+        if enabled is None:
+            enabled = os.environ.get(GOVERNOR_ENV, '1') != '0'
+        self.enabled = enabled
+        self.ear_threshold = ear_threshold
+        self.mar_threshold = mar_threshold
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.calm_frames = 0
+        self.ear_slope = 0.0
+        self._last_ear = None
+        self._last_time = None
+
+        # Reporting
+        self.frames = 0
+        self.started = time.time()
+        self.cpu_started = time.process_time()
+        self.max_frame_gap = 0.0
+        self.risk_since = None
+        self.risk_alerted = False
+        self.alert_latencies = []
+
+    def update(self, now, score, ear, mar, face_found):
+        self.frames += 1
+        if self._last_time is not None:
+            dt = now - self._last_time
+            self.max_frame_gap = max(self.max_frame_gap, dt)
+            if face_found and self._last_ear is not None and dt > 0:
+                slope = (ear - self._last_ear) / dt
+                self.ear_slope += EAR_SMOOTHING * (slope - self.ear_slope)
+        self._last_time = now
+        self._last_ear = ear if face_found else None
+
+        risky = (not face_found
+                 or score > LOW_SCORE
+                 or ear < self.ear_threshold + EAR_MARGIN
+                 or self.ear_slope < -EAR_DROP_RATE
+                 or mar > self.mar_threshold)
+
+        # Alert latency is measured from the first risky frame of an episode
+        if risky and self.risk_since is None:
+            self.risk_since = now
+        elif not risky:
+            self.risk_since = None
+            self.risk_alerted = False
+
+        if not self.enabled or risky:
+            self.calm_frames = 0
+            self.interval = self.min_interval
+        else:
+            self.calm_frames += 1
+            if self.calm_frames >= CALM_FRAMES:
+                self.interval = min(self.max_interval,
+                                    max(RELAX_START, self.interval * RELAX_FACTOR))
+        return self.interval
+
+    def wait_ms(self, frame_started, minimum=1, now=None):
+        # Time left in the current interval, for cv2.waitKey / root.after
+        now = time.time() if now is None else now
+        remaining = self.interval - (now - frame_started)
+        return max(minimum, int(remaining * 1000))
+
+    def note_alarm(self, now):
+        # Only the first alarm of an episode; repeats are paced by the cooldown
+        if self.risk_since is not None and not self.risk_alerted:
+            self.alert_latencies.append(now - self.risk_since)
+            self.risk_alerted = True
+
+    def report(self):
+        wall = time.time() - self.started
+        cpu = time.process_time() - self.cpu_started
+        return {
+            'frames': self.frames,
+            'avg_fps': self.frames / wall if wall > 0 else 0.0,
+            # Share of one core; above 100% means several cores were busy
+            'avg_cpu_percent': 100.0 * cpu / wall if wall > 0 else 0.0,
+            # Longest time a change in the driver's state could go unseen
+            'worst_frame_gap': self.max_frame_gap,
+            'alerted_episodes': len(self.alert_latencies),
+            'worst_alert_latency': max(self.alert_latencies) if self.alert_latencies else None,
+            'mean_alert_latency': (sum(self.alert_latencies) / len(self.alert_latencies)
+                                   if self.alert_latencies else None),
+        }
+
+    def print_report(self):
+        r = self.report()
+        print(f"Frames: {r['frames']}  avg FPS: {r['avg_fps']:.1f}  avg CPU: {r['avg_cpu_percent']:.0f}%")
+        print(f"Worst frame gap: {r['worst_frame_gap'] * 1000:.0f} ms")
+        if r['alerted_episodes']:
+            print(f"Alert latency over {r['alerted_episodes']} episodes: worst {r['worst_alert_latency']:.2f} s, "
+                  f"mean {r['mean_alert_latency']:.2f} s")
@@ -0,0 +1,172 @@
+import argparse
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+
+import db
+from online_model import MANIFEST_PATH, OnlineDrowsinessModel, load_current_model
+from session_events import ALARM, DROWSY_END, DROWSY_ONSET, HEARTBEAT
+
+MODELS_DIR = 'models'
+CHUNK_ROWS = 20000
+PASSES_PER_CHUNK = 5  # SGD epochs over each chunk; one pass underfits small increments
+KEEP_VERSIONS = 3
+
+# Weak labels: a sample is 'drowsy' inside a drowsy episode or in the
+# PRE_ALARM_SECONDS leading up to an alarm, and 'alert' when it is at least
+# CLEAR_SECONDS away from both. Samples in between are too ambiguous to use.
+PRE_ALARM_SECONDS = 10.0
+CLEAR_SECONDS = 60.0
+
+
+# Model versions and publishing
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def publish(model, manifest, watermark, manifest_path=MANIFEST_PATH):
+    # The model file is written under a new versioned name first; swapping
+    # the manifest with os.replace is the single atomic step that makes it
+    # current, so readers see either the old version or the new one.
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    version = manifest['version'] + 1
+    model_path = os.path.join(MODELS_DIR, f'drowsiness_online_v{version}.pkl')
+    joblib.dump(model, model_path + '.tmp')
+    os.replace(model_path + '.tmp', model_path)
+
+    new_manifest = {
+        'version': version,
+        'watermark': watermark,
+        'model_path': model_path,
+        'samples_seen': model.samples_seen,
+        'published_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    save_manifest(new_manifest, manifest_path)
+
+    for old in range(1, version - KEEP_VERSIONS + 1):
+        old_path = os.path.join(MODELS_DIR, f'drowsiness_online_v{old}.pkl')
+        if os.path.exists(old_path):
+            os.remove(old_path)
+    return new_manifest
+
+
+# Training data
+
+def load_label_events(conn, lower, upper):
+    # Per session: sorted alarm times and (onset, end) drowsy episodes
+    c = conn.cursor()
+    c.execute('''SELECT session_id, timestamp, event FROM session_events
+                 WHERE session_id > ? AND session_id <= ? AND event IN (?, ?, ?)
+                 ORDER BY session_id, timestamp''',
+              (lower, upper, ALARM, DROWSY_ONSET, DROWSY_END))
+    alarms = {}
+    episodes = {}
+    onset = {}
+    for session_id, timestamp, event in c.fetchall():
+        if event == ALARM:
+            alarms.setdefault(session_id, []).append(timestamp)
+        elif event == DROWSY_ONSET:
+            onset[session_id] = timestamp
+        elif session_id in onset:
+            episodes.setdefault(session_id, []).append((onset.pop(session_id), timestamp))
+    return ({k: np.array(v) for k, v in alarms.items()},
+            {k: np.array(v) for k, v in episodes.items()})
+
+
+def weak_labels(session_ids, timestamps, alarms, episodes):
+    labels = np.full(len(timestamps), '', dtype='<U6')
+    for session_id in np.unique(session_ids):
+        idx = np.flatnonzero(session_ids == session_id)
+        t = timestamps[idx]
+        drowsy = np.zeros(len(t), dtype=bool)
+        distance = np.full(len(t), np.inf)
+
+        session_alarms = alarms.get(session_id)
+        if session_alarms is not None:
+            # Distance to the nearest alarm, and whether one follows shortly
+            pos = np.searchsorted(session_alarms, t)
+            nxt = session_alarms[np.minimum(pos, len(session_alarms) - 1)]
+            prv = session_alarms[np.maximum(pos - 1, 0)]
+            distance = np.minimum(np.abs(nxt - t), np.abs(t - prv))
+            drowsy |= (nxt >= t) & (nxt - t <= PRE_ALARM_SECONDS)
+
+        for start, end in episodes.get(session_id, []):
+            drowsy |= (t >= start) & (t <= end)
+            outside = np.where(t < start, start - t, np.where(t > end, t - end, 0.0))
+            distance = np.minimum(distance, outside)
+
+        labels[idx[drowsy]] = 'drowsy'
+        labels[idx[~drowsy & (distance >= CLEAR_SECONDS)]] = 'alert'
+    return labels
+
+
+def iter_samples(conn, lower, upper):
+    # Heartbeat samples only: sessions recorded before the event log have no
+    # alarm timestamps to label them with. EAR 0 means no face was found.
+    c = conn.cursor()
+    c.execute('''SELECT session_id, timestamp, ear, mar FROM session_events
+                 WHERE session_id > ? AND session_id <= ? AND event = ? AND ear > 0''',
+              (lower, upper, HEARTBEAT))
+    while True:
+        rows = c.fetchmany(CHUNK_ROWS)
+        if not rows:
+            break
+        yield np.array(rows, dtype=np.float64)
+
+
+def train_increment(conn, model, lower, upper):
+    alarms, episodes = load_label_events(conn, lower, upper)
+    used = 0
+    for chunk in iter_samples(conn, lower, upper):
+        session_ids = chunk[:, 0].astype(np.int64)
+        labels = weak_labels(session_ids, chunk[:, 1], alarms, episodes)
+        keep = labels != ''
+        if not keep.any():
+            continue
+        model.partial_fit(chunk[keep, 2], chunk[keep, 3], labels[keep], passes=PASSES_PER_CHUNK)
+        used += int(keep.sum())
+    return used
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update the online drowsiness model from new sessions")
+    parser.add_argument('--db', default=db.DB_PATH)
+    args = parser.parse_args()
+
+    model, manifest = load_current_model()
+    if model is None:
+        model = OnlineDrowsinessModel()
+
+    pool = db.ConnectionPool(args.db, size=1)
+    try:
+        with pool.connection() as conn:
+            # Older databases lack session_events
+            db.migrate(conn)
+            lower = manifest['watermark']
+            upper = db.find_upper_bound(conn, lower)
+            if upper <= lower:
+                print(f"No new sessions since watermark {lower}")
+                return
+            used = train_increment(conn, model, lower, upper)
+    finally:
+        pool.close()
+
+    if not used:
+        # Nothing labelled; still move the watermark so these sessions are not re-read
+        save_manifest(dict(manifest, watermark=upper))
+        print(f"Sessions {lower + 1}-{upper} had no usable samples")
+        return
+
+    manifest = publish(model, manifest, upper)
+    print(f"Trained on {used} samples from sessions {lower + 1}-{upper}; "
+          f"published version {manifest['version']} ({manifest['model_path']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import os
+
+import dlib
+import numpy as np
+
+FULL_PREDICTOR_PATH = "shape_predictor_68_face_landmarks.dat"
+EYE_MOUTH_PREDICTOR_PATH = "shape_predictor_eye_mouth_32.dat"
+FULL_PREDICTOR_URL = "http://dlib.net/files/shape_predictor_68_face_landmarks.dat.bz2"
+
+# Set to 'full', 'eye_mouth' or a path to a .dat file to pick the predictor
+PREDICTOR_ENV = 'DROWSINESS_PREDICTOR'
+PREDICTORS = {'full': FULL_PREDICTOR_PATH, 'eye_mouth': EYE_MOUTH_PREDICTOR_PATH}
+
+# 68-point indices the trimmed predictor is trained on, in output order
+EYE_MOUTH_POINTS = list(range(36, 68))
+
+# Where LEFT_EYE / RIGHT_EYE / MOUTH sit in each predictor's output
+LAYOUTS = {
+    68: {'LEFT_EYE': list(range(36, 42)), 'RIGHT_EYE': list(range(42, 48)), 'MOUTH': list(range(48, 68))},
+    32: {'LEFT_EYE': list(range(0, 6)), 'RIGHT_EYE': list(range(6, 12)), 'MOUTH': list(range(12, 32))},
+}
+
+
+def predictor_path():
+    choice = os.environ.get(PREDICTOR_ENV, 'full')
+    return PREDICTORS.get(choice, choice)
+
+
+def missing_predictor_message(path=None):
+    # None when the file exists, otherwise how to get it
+    path = path or predictor_path()
+    if os.path.exists(path):
+        return None
+    name = os.path.basename(path)
+    if name == os.path.basename(EYE_MOUTH_PREDICTOR_PATH):
+        return f"{path} not found. Train it with: python train_eye_mouth_predictor.py --output {path}"
+    if name == os.path.basename(FULL_PREDICTOR_PATH):
+        return f"{path} not found. Download and extract it from: {FULL_PREDICTOR_URL}"
+    return (f"{path} not found. Set {PREDICTOR_ENV} to 'full', 'eye_mouth' "
+            "or the path of an existing .dat file")
+
+
+def count_parts(predictor):
+    # The Python bindings do not expose the part count of a model, so run it once
+    shape = predictor(np.zeros((64, 64), dtype=np.uint8), dlib.rectangle(0, 0, 63, 63))
+    return shape.num_parts
+
+
+def load_predictor(path=None):
+    """Return (predictor, layout) for the selected predictor file.
+
+    layout maps 'LEFT_EYE', 'RIGHT_EYE' and 'MOUTH' to indices into the
+    array returned by shape_to_np for that predictor. Raises
+    FileNotFoundError, with instructions, when the file is missing.
+    """
+    path = path or predictor_path()
+    message = missing_predictor_message(path)
+    if message:
+        raise FileNotFoundError(message)
+    predictor = dlib.shape_predictor(path)
+    num_parts = count_parts(predictor)
+    if num_parts not in LAYOUTS:
+        raise ValueError(f"Unsupported shape predictor with {num_parts} points")
+    return predictor, LAYOUTS[num_parts]
+
+
+def shape_to_np(shape):
+    return np.array([[p.x, p.y] for p in shape.parts()])
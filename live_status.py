@@ -0,0 +1,336 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from urllib.parse import unquote, urlsplit
+
+LIVE_HOST = '127.0.0.1'
+LIVE_PORT = 8765
+LIVE_PORT_ENV = 'DROWSINESS_LIVE_PORT'  # '0' turns the service off
+MAX_UPDATES_PER_SECOND = 4.0  # Per client; the detection loop publishes every frame
+KEEPALIVE_INTERVAL = 15.0     # Seconds between SSE comments / WebSocket pings when idle
+MAX_CLIENTS = 1000
+MAX_HEADER_BYTES = 8192
+WRITE_BUFFER_HIGH = 1024      # About one status message; drain() waits beyond it
+SEND_BUFFER_BYTES = 4096      # Kernel send buffer per streaming client
+
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+WS_TEXT, WS_CLOSE, WS_PING, WS_PONG = 0x1, 0x8, 0x9, 0xA
+
+
+def ws_frame(payload, opcode=WS_TEXT):
+    # Server to client frames are never masked
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    return header + payload
+
+
+async def read_ws_frame(reader):
+    first, second = await reader.readexactly(2)
+    opcode = first & 0x0F
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack('!H', await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack('!Q', await reader.readexactly(8))[0]
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return opcode, payload
+
+
+class Topic:
+    """Latest status of one stream and the clients waiting for it.
+
+    Only the newest status is kept. A client still busy sending an older
+    one simply picks up whatever is newest when it is ready (see
+    LiveStatusServer._stream), so slow clients skip intermediate states
+    instead of building a backlog.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.version = 0
+        self.message = None
+        self._encoded = {}
+        self._waiters = set()
+
+    def publish(self, message):
+        self.version += 1
+        self.message = message
+        self._encoded = {}
+        for event in self._waiters:
+            event.set()
+
+    def encoded(self, kind):
+        # Encoded once per update, however many clients receive it
+        data = self._encoded.get(kind)
+        if data is None:
+            payload = self.message.encode('utf-8')
+            if kind == 'sse':
+                data = b'event: status\ndata: ' + payload + b'\n\n'
+            else:
+                data = ws_frame(payload)
+            self._encoded[kind] = data
+        return data
+
+    async def updates(self, min_interval):
+        """Yield the newest version at most once per min_interval.
+
+        Yields None instead after KEEPALIVE_INTERVAL without an update.
+        """
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        self._waiters.add(event)
+        seen = 0
+        try:
+            while True:
+                if self.version == seen:
+                    event.clear()
+                    try:
+                        await asyncio.wait_for(event.wait(), KEEPALIVE_INTERVAL)
+                    except asyncio.TimeoutError:
+                        yield None
+                        continue
+                seen = self.version
+                sent_at = loop.time()
+                yield seen
+                delay = min_interval - (loop.time() - sent_at)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+        finally:
+            self._waiters.discard(event)
+
+
+class LiveStatusServer:
+    """Serves live detection status over Server-Sent Events and WebSocket.
+
+    Runs its own asyncio loop on a daemon thread; the detection loop only
+    calls publish(), which hands the status over with call_soon_threadsafe.
+
+        GET /streams          JSON list of streams and their latest status
+        GET /status/<stream>  latest status as JSON
+        GET /events/<stream>  Server-Sent Events
+        GET /ws/<stream>      WebSocket, one JSON text message per update
+    """
+
+    def __init__(self, host=LIVE_HOST, port=LIVE_PORT, max_rate=MAX_UPDATES_PER_SECOND):
+        self.host = host
+        self.port = port
+        self.min_interval = 1.0 / max_rate
+        self.topics = {}
+        self.clients = 0
+        self.loop = asyncio.new_event_loop()
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        started = threading.Event()
+        errors = []
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            try:
+                self._server = self.loop.run_until_complete(
+                    asyncio.start_server(self._handle, self.host, self.port, limit=MAX_HEADER_BYTES))
+            except OSError as e:
+                errors.append(e)
+                started.set()
+                return
+            started.set()
+            self.loop.run_forever()
+            self._server.close()
+            # Open SSE / WebSocket handlers never finish on their own
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.run_until_complete(self._server.wait_closed())
+            self.loop.close()
+
+        self._thread = threading.Thread(target=run, name='live-status', daemon=True)
+        self._thread.start()
+        started.wait()
+        if errors:
+            raise errors[0]
+        return self
+
+    def stop(self):
+        if self._thread is not None and self._thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+
+    def publish(self, stream, status):
+        # Called from the detection thread
+        message = json.dumps(dict(status, stream=stream, time=time.time()))
+        self.loop.call_soon_threadsafe(self._publish, stream, message)
+
+    def _publish(self, stream, message):
+        self._topic(stream).publish(message)
+
+    def _topic(self, stream):
+        # Clients may subscribe before the driver starts detecting
+        return self.topics.get(stream) or self.topics.setdefault(stream, Topic(stream))
+
+    # HTTP
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            if len(request_line) < 2 or request_line[0] != 'GET':
+                await self._respond(writer, 405, 'Method Not Allowed')
+                return
+            path = urlsplit(request_line[1]).path.rstrip('/')
+            route, _, stream = path.lstrip('/').partition('/')
+            stream = unquote(stream)
+
+            if route == 'streams':
+                body = '[' + ','.join(t.message for t in self.topics.values() if t.message) + ']'
+                await self._respond(writer, 200, 'OK', body, 'application/json')
+            elif route == 'status' and stream:
+                topic = self.topics.get(stream)
+                if topic is None or topic.message is None:
+                    await self._respond(writer, 404, 'Not Found')
+                else:
+                    await self._respond(writer, 200, 'OK', topic.message, 'application/json')
+            elif route in ('events', 'ws') and stream:
+                if self.clients >= MAX_CLIENTS:
+                    await self._respond(writer, 503, 'Service Unavailable')
+                    return
+                self.clients += 1
+                try:
+                    if route == 'events':
+                        await self._serve_sse(writer, self._topic(stream))
+                    else:
+                        await self._serve_websocket(reader, writer, headers, self._topic(stream))
+                finally:
+                    self.clients -= 1
+            else:
+                await self._respond(writer, 404, 'Not Found')
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            # Server shutting down; this handler is the top of its task
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, code, reason, body='', content_type='text/plain'):
+        data = body.encode('utf-8')
+        writer.write(f"HTTP/1.1 {code} {reason}\r\n"
+                     f"Content-Type: {content_type}\r\n"
+                     f"Content-Length: {len(data)}\r\n"
+                     "Access-Control-Allow-Origin: *\r\n"
+                     "Connection: close\r\n\r\n".encode('latin-1') + data)
+        await writer.drain()
+
+    async def _serve_sse(self, writer, topic):
+        writer.write(b"HTTP/1.1 200 OK\r\n"
+                     b"Content-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\n"
+                     b"Access-Control-Allow-Origin: *\r\n"
+                     b"Connection: keep-alive\r\n\r\n"
+                     b"retry: 2000\n\n")
+        await writer.drain()
+        await self._stream(writer, topic, 'sse', b": keepalive\n\n")
+
+    async def _serve_websocket(self, reader, writer, headers, topic):
+        key = headers.get('sec-websocket-key')
+        if headers.get('upgrade', '').lower() != 'websocket' or not key:
+            await self._respond(writer, 400, 'Bad Request', 'Expected a WebSocket upgrade')
+            return
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode('latin-1')).digest()).decode('latin-1')
+        writer.write(b"HTTP/1.1 101 Switching Protocols\r\n"
+                     b"Upgrade: websocket\r\n"
+                     b"Connection: Upgrade\r\n"
+                     b"Sec-WebSocket-Accept: " + accept.encode('latin-1') + b"\r\n\r\n")
+        await writer.drain()
+
+        sender = asyncio.ensure_future(self._stream(writer, topic, 'ws', ws_frame(b'', WS_PING)))
+        try:
+            # Clients only ever send control frames; answer pings, stop on close
+            while not sender.done():
+                opcode, payload = await read_ws_frame(reader)
+                if opcode == WS_CLOSE:
+                    writer.write(ws_frame(payload[:2], WS_CLOSE))
+                    await writer.drain()
+                    break
+                if opcode == WS_PING:
+                    writer.write(ws_frame(payload, WS_PONG))
+        finally:
+            sender.cancel()
+            try:
+                await sender
+            except (asyncio.CancelledError, ConnectionError):
+                pass
+
+    async def _stream(self, writer, topic, kind, keepalive):
+        # Keep what is queued for a client down to about one message, in our
+        # buffer and in the kernel's, so a slow client cannot fall behind by
+        # more than that
+        writer.transport.set_write_buffer_limits(high=WRITE_BUFFER_HIGH)
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER_BYTES)
+
+        async for version in topic.updates(self.min_interval):
+            # Until the client has taken the last message, skip versions;
+            # what gets written afterwards is the newest status by then
+            while writer.transport.get_write_buffer_size() > 0:
+                if writer.transport.is_closing():
+                    return
+                await asyncio.sleep(self.min_interval)
+            writer.write(keepalive if version is None else topic.encoded(kind))
+            await writer.drain()
+
+
+_server = None
+
+
+def start_server(port=None, host=LIVE_HOST):
+    """Start the live status service on a daemon thread; returns it or None."""
+    global _server
+    if _server is not None:
+        return _server
+    if port is None:
+        port = int(os.environ.get(LIVE_PORT_ENV, LIVE_PORT))
+    if port == 0:
+        return None
+    try:
+        _server = LiveStatusServer(host, port).start()
+    except OSError as e:
+        print(f"Warning: live status service not started on {host}:{port}: {e}")
+        return None
+    print(f"Live status available at http://{host}:{port}/streams")
+    return _server
+
+
+def publish(stream, status):
+    # No-op unless start_server() succeeded, so callers need not check
+    if _server is not None:
+        _server.publish(stream, status)
+
+
+def stop_server():
+    global _server
+    if _server is not None:
+        _server.stop()
+        _server = None
@@ -0,0 +1,255 @@
+import bisect
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_HOST = '127.0.0.1'
+METRICS_PORT = 9108
+METRICS_PORT_ENV = 'DROWSINESS_METRICS_PORT'  # '0' turns the endpoint off
+
+# Seconds; covers a fast capture read up to a stalled frame
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+FPS_SMOOTHING = 0.1         # EWMA weight of the newest frame interval
+FACE_RATIO_SMOOTHING = 1 / 30.0  # Roughly the last second of frames at full rate
+
+
+# Metric types
+#
+# Updates take no lock. Each metric is written by a single thread (the frame
+# loop or the DB writer) and the scrape thread only reads, so a scrape may
+# see a value one update old but never holds up a frame. Only creating a new
+# label value takes the registry lock, once.
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, help_text, label=None):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self._children = {}
+
+    def labels(self, value):
+        child = self._children.get(value)
+        if child is None:
+            with _registry_lock:
+                child = self._children.setdefault(value, self._new_child())
+        return child
+
+    def _new_child(self):
+        return type(self)(self.name, self.help)
+
+    def _series(self):
+        if self.label is None:
+            yield '', self
+        else:
+            for value, child in list(self._children.items()):
+                yield f'{self.label}="{value}"', child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, child in self._series():
+            lines.extend(child._render_samples(labels))
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name, help_text, label=None):
+        super().__init__(name, help_text, label)
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def _render_samples(self, labels):
+        yield f"{self.name}{{{labels}}} {self.value}" if labels else f"{self.name} {self.value}"
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, label=None):
+        super().__init__(name, help_text, label)
+        self.value = 0.0
+        self._function = None
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, function):
+        # Evaluated at scrape time, e.g. a queue's qsize
+        self._function = function
+
+    def _render_samples(self, labels):
+        value = self._function() if self._function is not None else self.value
+        yield f"{self.name}{{{labels}}} {value}" if labels else f"{self.name} {value}"
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, label=None, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label)
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last one is +Inf
+        self.sum = 0.0
+
+    def _new_child(self):
+        return Histogram(self.name, self.help, buckets=self.buckets)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def _render_samples(self, labels):
+        prefix = labels + ',' if labels else ''
+        counts = list(self.counts)
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            total += count
+            yield f'{self.name}_bucket{{{prefix}le="{bound}"}} {total}'
+        suffix = f"{{{labels}}}" if labels else ''
+        yield f"{self.name}_sum{suffix} {self.sum}"
+        yield f"{self.name}_count{suffix} {total}"
+
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def register(metric):
+    with _registry_lock:
+        _registry.append(metric)
+    return metric
+
+
+def render():
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# Detection pipeline metrics, shared by GUI.py and drowiness_yawn.py
+
+FRAMES = register(Counter('drowsiness_frames_total', "Frames processed by the detection loop"))
+FRAMES_WITH_FACE = register(Counter('drowsiness_frames_with_face_total', "Processed frames with a face found"))
+FRAMES_DROPPED = register(Counter('drowsiness_frames_dropped_total',
+                                  "Camera frames never processed: failed reads and frames skipped on the frame bus"))
+ALARMS = register(Counter('drowsiness_alarms_total', "Drowsiness alarms sounded"))
+LOOP_ERRORS = register(Counter('drowsiness_loop_errors_total', "Exceptions raised in the detection loop"))
+FPS = register(Gauge('drowsiness_fps', "Smoothed frames processed per second"))
+FACE_RATIO = register(Gauge('drowsiness_face_found_ratio', "Smoothed share of recent frames with a face found"))
+SCORE = register(Gauge('drowsiness_score', "Current drowsiness score"))
+EAR = register(Gauge('drowsiness_ear', "Current eye aspect ratio"))
+MAR = register(Gauge('drowsiness_mar', "Current mouth aspect ratio"))
+STAGE_SECONDS = register(Histogram('drowsiness_stage_seconds', "Time spent per pipeline stage", label='stage'))
+FRAME_SECONDS = register(Histogram('drowsiness_frame_seconds', "Processing time per frame, excluding waits"))
+DB_QUEUE_DEPTH = register(Gauge('drowsiness_db_queue_depth', "Writes queued for the database writer thread"))
+DB_WRITE_SECONDS = register(Histogram('drowsiness_db_write_seconds', "Time per database writer transaction"))
+DB_WRITE_ERRORS = register(Counter('drowsiness_db_write_errors_total', "Failed database writer transactions"))
+
+# Bound once so the frame loop does not look up labels per frame
+CAPTURE_SECONDS = STAGE_SECONDS.labels('capture')
+DETECT_SECONDS = STAGE_SECONDS.labels('detect')
+LANDMARKS_SECONDS = STAGE_SECONDS.labels('landmarks')
+DISPLAY_SECONDS = STAGE_SECONDS.labels('display')
+STORE_SECONDS = STAGE_SECONDS.labels('store')
+
+
+class LoopMetrics:
+    """Per-run bookkeeping that turns raw frame events into the gauges above."""
+
+    def __init__(self, cap=None):
+        self.cap = cap
+        self._skipped = getattr(cap, 'frames_skipped', 0)
+        self._last_frame = None
+        self._fps = None
+        self._face_ratio = None
+
+    def frame_read(self, ok):
+        if not ok:
+            FRAMES_DROPPED.inc()
+        # FrameBusReader counts frames that were overwritten before we asked
+        skipped = getattr(self.cap, 'frames_skipped', 0)
+        if skipped > self._skipped:
+            FRAMES_DROPPED.inc(skipped - self._skipped)
+            self._skipped = skipped
+
+    def frame_done(self, now, face_found, score, ear, mar, frame_seconds=None):
+        FRAMES.inc()
+        if face_found:
+            FRAMES_WITH_FACE.inc()
+        SCORE.set(score)
+        EAR.set(ear)
+        MAR.set(mar)
+        if frame_seconds is not None:
+            FRAME_SECONDS.observe(frame_seconds)
+
+        if self._last_frame is not None and now > self._last_frame:
+            fps = 1.0 / (now - self._last_frame)
+            self._fps = fps if self._fps is None else self._fps + FPS_SMOOTHING * (fps - self._fps)
+            FPS.set(self._fps)
+        self._last_frame = now
+
+        seen = 1.0 if face_found else 0.0
+        if self._face_ratio is None:
+            self._face_ratio = seen
+        else:
+            self._face_ratio += FACE_RATIO_SMOOTHING * (seen - self._face_ratio)
+        FACE_RATIO.set(self._face_ratio)
+
+
+# HTTP endpoint
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # One line per scrape would drown the detection output
+        pass
+
+
+_server = None
+
+
+def start_server(port=None, host=METRICS_HOST):
+    """Serve /metrics from a daemon thread; returns the server or None."""
+    global _server
+    if _server is not None:
+        return _server
+    if port is None:
+        port = int(os.environ.get(METRICS_PORT_ENV, METRICS_PORT))
+    if port == 0:
+        return None
+    try:
+        _server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        # Another detection process may already own the port
+        print(f"Warning: metrics endpoint not started on {host}:{port}: {e}")
+        return None
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, name='metrics', daemon=True).start()
+    print(f"Metrics available at http://{host}:{port}/metrics")
+    return _server
+
+
+def stop_server():
+    global _server
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
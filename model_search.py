@@ -0,0 +1,147 @@
+import itertools
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import StratifiedKFold
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import PolynomialFeatures, StandardScaler
+
+SEARCH_CONFIG_PATH = 'search_space.json'
+RESULTS_PATH = 'model_search_results.json'
+LATENCY_REPEATS = 200  # Single-sample predictions timed per candidate
+
+# Used when search_space.json is missing; same layout as the file
+DEFAULT_SEARCH_SPACE = {
+    'cv_folds': 5,
+    # Candidates within this much of the best CV accuracy compete on cost
+    'accuracy_tolerance': 0.005,
+    # Candidates slower than this per sample are never selected (null = no cap)
+    'max_latency_ms': None,
+    'models': {
+        'random_forest': {'n_estimators': [50, 100], 'max_depth': [None, 8]},
+        'gradient_boosting': {'n_estimators': [100], 'learning_rate': [0.1], 'max_depth': [3]},
+        'logistic_regression': {'degree': [2, 3], 'C': [1.0]},
+    },
+}
+
+
+def build_model(family, params):
+    if family == 'random_forest':
+        return RandomForestClassifier(random_state=42, **params)
+    if family == 'gradient_boosting':
+        return GradientBoostingClassifier(random_state=42, **params)
+    if family == 'logistic_regression':
+        # Polynomial terms give the linear model EAR*MAR, EAR^2, ... to work with
+        params = dict(params)
+        degree = params.pop('degree', 2)
+        return make_pipeline(PolynomialFeatures(degree), StandardScaler(),
+                             LogisticRegression(max_iter=1000, **params))
+    raise ValueError(f"Unknown model family: {family}")
+
+
+def load_search_space(path=SEARCH_CONFIG_PATH):
+    if not os.path.exists(path):
+        return DEFAULT_SEARCH_SPACE
+    with open(path) as f:
+        config = json.load(f)
+    return {**DEFAULT_SEARCH_SPACE, **config}
+
+
+def expand_candidates(space):
+    candidates = []
+    for family, grid in space['models'].items():
+        names = sorted(grid)
+        for values in itertools.product(*(grid[name] for name in names)):
+            candidates.append((family, dict(zip(names, values))))
+    return candidates
+
+
+def _score_fold(family, params, X, y, train_idx, test_idx):
+    model = build_model(family, params)
+    model.fit(X[train_idx], y[train_idx])
+    return model.score(X[test_idx], y[test_idx])
+
+
+def _fit(family, params, X, y):
+    model = build_model(family, params)
+    model.fit(X, y)
+    return model
+
+
+def single_sample_latency(model, X, repeats=LATENCY_REPEATS):
+    # Median wall time of predict() on one row, which is how the frame loop
+    # would call it; the first call is discarded as warm-up
+    rows = [X[i % len(X)].reshape(1, -1) for i in range(repeats + 1)]
+    model.predict(rows[0])
+    timings = []
+    for row in rows[1:]:
+        start = time.perf_counter()
+        model.predict(row)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000.0
+
+
+def select_candidate(results, accuracy_tolerance, max_latency_ms=None):
+    eligible = [r for r in results if max_latency_ms is None or r['latency_ms'] <= max_latency_ms]
+    if not eligible:
+        eligible = results
+    best_accuracy = max(r['cv_accuracy'] for r in eligible)
+    close = [r for r in eligible if r['cv_accuracy'] >= best_accuracy - accuracy_tolerance]
+    return min(close, key=lambda r: (r['latency_ms'], r['model_bytes'], -r['cv_accuracy']))
+
+
+def run_search(X, y, space=None, n_jobs=-1):
+    """Cross-validate every candidate in parallel and profile its runtime cost.
+
+    Returns (results, chosen_result, chosen_model); the chosen model is
+    refitted on all of X.
+    """
+    space = space or load_search_space()
+    X = np.asarray(X)
+    y = np.asarray(y)
+    candidates = expand_candidates(space)
+    folds = list(StratifiedKFold(n_splits=space['cv_folds'], shuffle=True, random_state=42).split(X, y))
+
+    # One job per (candidate, fold) keeps every core busy even when the
+    # candidates differ a lot in training time
+    with Parallel(n_jobs=n_jobs) as parallel:
+        scores = parallel(delayed(_score_fold)(family, params, X, y, train_idx, test_idx)
+                          for family, params in candidates
+                          for train_idx, test_idx in folds)
+        models = parallel(delayed(_fit)(family, params, X, y) for family, params in candidates)
+
+    results = []
+    n_folds = len(folds)
+    for i, ((family, params), model) in enumerate(zip(candidates, models)):
+        fold_scores = scores[i * n_folds:(i + 1) * n_folds]
+        # Latency is measured here, serially, so candidates do not compete for cores
+        results.append({
+            'family': family,
+            'params': params,
+            'cv_accuracy': float(np.mean(fold_scores)),
+            'cv_std': float(np.std(fold_scores)),
+            'latency_ms': single_sample_latency(model, X),
+            'model_bytes': len(pickle.dumps(model)),
+        })
+
+    chosen = select_candidate(results, space['accuracy_tolerance'], space.get('max_latency_ms'))
+    return results, chosen, models[results.index(chosen)]
+
+
+def print_results(results, chosen):
+    print(f"{'family':<20} {'params':<45} {'cv acc':>8} {'latency':>10} {'size':>10}")
+    for r in sorted(results, key=lambda r: r['cv_accuracy'], reverse=True):
+        marker = '*' if r is chosen else ' '
+        print(f"{marker}{r['family']:<19} {json.dumps(r['params']):<45} {r['cv_accuracy']:8.4f} "
+              f"{r['latency_ms']:8.3f}ms {r['model_bytes'] / 1024:8.1f}KB")
+
+
+def save_results(results, chosen, path=RESULTS_PATH, **extra):
+    with open(path, 'w') as f:
+        json.dump({'results': results, 'chosen': chosen, **extra}, f, indent=2)
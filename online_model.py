@@ -0,0 +1,58 @@
+import json
+import os
+
+import joblib
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import StandardScaler
+
+# Kept apart from incremental_train.py so pickled models refer to this
+# module rather than to whichever script happened to train them.
+
+MANIFEST_PATH = 'drowsiness_online_model.json'
+CLASSES = np.array(['alert', 'drowsy'])
+
+
+def online_features(ear, mar):
+    return np.column_stack([ear, mar, ear * mar, ear * ear, mar * mar])
+
+
+class OnlineDrowsinessModel:
+    """Scaler + SGD logistic regression that can keep learning with partial_fit."""
+
+    def __init__(self):
+        self.scaler = StandardScaler()
+        self.clf = SGDClassifier(loss='log_loss', alpha=1e-4, random_state=42)
+        self.samples_seen = 0
+
+    def partial_fit(self, ear, mar, labels, passes=1):
+        X = online_features(ear, mar)
+        self.scaler.partial_fit(X)
+        X = self.scaler.transform(X)
+        # partial_fit has no class_weight='balanced', so weight per batch
+        counts = {c: max(1, int(np.sum(labels == c))) for c in CLASSES}
+        weights = np.array([len(labels) / (len(CLASSES) * counts[c]) for c in labels])
+        for _ in range(passes):
+            self.clf.partial_fit(X, labels, classes=CLASSES, sample_weight=weights)
+        self.samples_seen += len(labels)
+
+    def predict(self, ear, mar):
+        return self.clf.predict(self.scaler.transform(online_features(np.atleast_1d(ear), np.atleast_1d(mar))))
+
+    def predict_proba(self, ear, mar):
+        X = online_features(np.atleast_1d(ear), np.atleast_1d(mar))
+        return self.clf.predict_proba(self.scaler.transform(X))
+
+
+def load_manifest(path=MANIFEST_PATH):
+    if not os.path.exists(path):
+        return {'version': 0, 'watermark': 0, 'model_path': None, 'samples_seen': 0}
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_current_model(manifest_path=MANIFEST_PATH):
+    manifest = load_manifest(manifest_path)
+    if not manifest['model_path']:
+        return None, manifest
+    return joblib.load(manifest['model_path']), manifest
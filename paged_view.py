@@ -0,0 +1,167 @@
+import queue
+import threading
+
+import db
+
+POLL_MS = 20             # How often the Tk loop checks for a finished page
+INSERT_BATCH = 50        # Rows inserted into the Treeview per Tk tick
+PREFETCH_FRACTION = 0.9  # Fetch the next page once the view is scrolled this far
+SEARCH_DELAY_MS = 250    # Typing pause before a search box queries again
+NAVIGATION_KEYS = {'Up', 'Down', 'Left', 'Right', 'Return', 'Escape', 'Tab'}
+
+
+class PagedTreeLoader:
+    """Fills a ttk.Treeview page by page from a background thread.
+
+    ``fetch_page(conn, cursor)`` runs on a worker thread and returns
+    ``(rows, next_cursor)``. Rows are handed back through a queue and
+    inserted on the Tk thread a batch at a time; the next page is only
+    requested when the user scrolls near the end of what is loaded.
+    """
+
+    def __init__(self, root, tree, scrollbar=None):
+        self.root = root
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.fetch_page = None
+        self._results = queue.Queue()
+        self._generation = 0
+        self._cursor = None
+        self._exhausted = True
+        self._loading = False
+        self._pending_rows = []
+        tree.configure(yscrollcommand=self.yscroll)
+
+    def reset(self, fetch_page):
+        # Results still in flight for an older query are dropped by generation
+        self._generation += 1
+        self.fetch_page = fetch_page
+        self._cursor = None
+        self._exhausted = False
+        self._loading = False
+        self._pending_rows = []
+        self.tree.delete(*self.tree.get_children())
+        self._request_page()
+
+    def yscroll(self, first, last):
+        if self.scrollbar is not None:
+            self.scrollbar.set(first, last)
+        if float(last) >= PREFETCH_FRACTION:
+            self._request_page()
+
+    def _request_page(self):
+        if self._loading or self._exhausted or self._pending_rows or self.fetch_page is None:
+            return
+        self._loading = True
+        args = (self._generation, self.fetch_page, self._cursor)
+        threading.Thread(target=self._worker, args=args, daemon=True).start()
+        self.root.after(POLL_MS, self._poll)
+
+    def _worker(self, generation, fetch_page, cursor):
+        try:
+            with db.connection() as conn:
+                rows, next_cursor = fetch_page(conn, cursor)
+            self._results.put((generation, rows, next_cursor, None))
+        except Exception as e:
+            self._results.put((generation, [], None, e))
+
+    def _poll(self):
+        try:
+            generation, rows, next_cursor, error = self._results.get_nowait()
+        except queue.Empty:
+            if self._loading:
+                self.root.after(POLL_MS, self._poll)
+            return
+
+        if generation != self._generation:
+            # Stale page from a previous filter; keep waiting for ours
+            self.root.after(POLL_MS, self._poll)
+            return
+
+        self._loading = False
+        if error is not None:
+            print(f"Error loading page: {error}")
+            self._exhausted = True
+            return
+        self._cursor = next_cursor
+        self._exhausted = next_cursor is None
+        self._pending_rows = list(rows)
+        self._insert_batch(generation)
+
+    def _insert_batch(self, generation):
+        if generation != self._generation or not self.tree.winfo_exists():
+            return
+        batch = self._pending_rows[:INSERT_BATCH]
+        self._pending_rows = self._pending_rows[INSERT_BATCH:]
+        for row in batch:
+            self.tree.insert('', 'end', values=row)
+        if self._pending_rows:
+            self.root.after(1, self._insert_batch, generation)
+        else:
+            # The view may still have room (or already be scrolled down)
+            first, last = self.tree.yview()
+            if last >= PREFETCH_FRACTION:
+                self._request_page()
+
+
+class ComboboxSearchLoader:
+    """Fills a ttk.Combobox with the first page of matches for its text.
+
+    ``fetch_values(conn, search)`` runs on a worker thread and returns the
+    strings to offer; typing re-queries after a short pause instead of the
+    box holding every row of the table.
+    """
+
+    def __init__(self, root, combobox, fetch_values):
+        self.root = root
+        self.combobox = combobox
+        self.fetch_values = fetch_values
+        self._results = queue.Queue()
+        self._generation = 0
+        self._after_id = None
+        self._polling = False
+        combobox.bind('<KeyRelease>', self._on_key)
+
+    def _on_key(self, event):
+        if event.keysym in NAVIGATION_KEYS:
+            return
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+        self._after_id = self.root.after(SEARCH_DELAY_MS, self.refresh, self.combobox.get().strip())
+
+    def refresh(self, search=''):
+        self._after_id = None
+        self._generation += 1
+        args = (self._generation, search)
+        threading.Thread(target=self._worker, args=args, daemon=True).start()
+        if not self._polling:
+            self._polling = True
+            self.root.after(POLL_MS, self._poll)
+
+    def _worker(self, generation, search):
+        try:
+            with db.connection() as conn:
+                values = self.fetch_values(conn, search)
+            self._results.put((generation, values, None))
+        except Exception as e:
+            self._results.put((generation, [], e))
+
+    def _poll(self):
+        try:
+            generation, values, error = self._results.get_nowait()
+        except queue.Empty:
+            self.root.after(POLL_MS, self._poll)
+            return
+        if generation != self._generation:
+            # Result of an older search; keep waiting for the newest
+            self.root.after(POLL_MS, self._poll)
+            return
+        self._polling = False
+        if error is not None:
+            print(f"Error loading choices: {error}")
+            return
+        if not self.combobox.winfo_exists():
+            return
+        self.combobox['values'] = values
+        if values and not self.combobox.get():
+            self.combobox.set(values[0])
@@ -0,0 +1,92 @@
+from scipy.spatial import distance as dist
+
+# Defaults used by GUI.py; evaluate_alerts.py varies them per configuration
+EAR_THRESHOLD = 0.25
+MAR_THRESHOLD = 0.85  # Increased threshold for better accuracy
+EAR_CONSEC_FRAMES = 20
+YAWN_CONSEC_FRAMES = 12  # Reduced frames for quicker yawn detection
+SCORE_THRESHOLD = 15
+YAWN_WEIGHT = 2  # Higher weight for yawning
+ALARM_COOLDOWN = 2
+
+
+def eye_aspect_ratio(eye):
+    A = dist.euclidean(eye[1], eye[5])
+    B = dist.euclidean(eye[2], eye[4])
+    C = dist.euclidean(eye[0], eye[3])
+    return (A + B) / (2.0 * C) if C != 0 else 0
+
+
+def mouth_aspect_ratio(mouth):
+    # Calculate distances between key mouth points
+    A = dist.euclidean(mouth[0], mouth[6])  # Horizontal distance
+
+    # Vertical distances
+    B1 = dist.euclidean(mouth[2], mouth[10])  # Top to bottom center
+    B2 = dist.euclidean(mouth[4], mouth[8])   # Midpoints
+
+    # Additional vertical measurement
+    C = dist.euclidean(mouth[3], mouth[9])    # Center points
+
+    # Combined mouth aspect ratio
+    mar = (B1 + B2 + C) / (3.0 * A) if A != 0 else 0
+    return mar
+
+
+class DrowsinessScorer:
+    """Eye and yawn frame counters plus the drowsiness score.
+
+    The GUI and evaluate_alerts.py both drive this, so an evaluation scores
+    clips exactly the way a driver's session is scored.
+    """
+
+    def __init__(self, ear_threshold=EAR_THRESHOLD, mar_threshold=MAR_THRESHOLD,
+                 ear_consec_frames=EAR_CONSEC_FRAMES, yawn_consec_frames=YAWN_CONSEC_FRAMES,
+                 score_threshold=SCORE_THRESHOLD, yawn_weight=YAWN_WEIGHT, alarm_cooldown=ALARM_COOLDOWN):
+        self.ear_threshold = ear_threshold
+        self.mar_threshold = mar_threshold
+        self.ear_consec_frames = ear_consec_frames
+        self.yawn_consec_frames = yawn_consec_frames
+        self.score_threshold = score_threshold
+        self.yawn_weight = yawn_weight
+        self.alarm_cooldown = alarm_cooldown
+        self.eye_frame_counter = 0
+        self.yawn_frame_counter = 0
+        self.score = 0
+        self.last_alarm_time = None
+
+    def update(self, now, ear, mar):
+        """Score one detected face; returns (eye_status, mouth_status, overall_status, alarm)."""
+        if ear < self.ear_threshold:
+            self.eye_frame_counter += 1
+            eye_status = "Closed"
+        else:
+            self.eye_frame_counter = max(0, self.eye_frame_counter - 1)
+            eye_status = "Open"
+
+        if mar > self.mar_threshold:
+            self.yawn_frame_counter += 1
+            mouth_status = "Yawning"
+        else:
+            self.yawn_frame_counter = max(0, self.yawn_frame_counter - 1)
+            mouth_status = "Closed"
+
+        if eye_status == "Closed" and self.eye_frame_counter >= self.ear_consec_frames:
+            self.score += 1
+        elif mouth_status == "Yawning" and self.yawn_frame_counter >= self.yawn_consec_frames:
+            self.score += self.yawn_weight
+        else:
+            self.score = max(0, self.score - 1)
+
+        overall_status = "Drowsy" if self.score > self.score_threshold else "Awake"
+        alarm = (overall_status == "Drowsy"
+                 and (self.last_alarm_time is None or now - self.last_alarm_time > self.alarm_cooldown))
+        if alarm:
+            self.last_alarm_time = now
+        return eye_status, mouth_status, overall_status, alarm
+
+    def no_face(self):
+        # No face detected - gradually decrease score
+        self.score = max(0, self.score - 1)
+        self.eye_frame_counter = 0
+        self.yawn_frame_counter = 0
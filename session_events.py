@@ -0,0 +1,193 @@
+import time
+
+# Event types stored in session_events
+SESSION_START = 'session_start'
+SESSION_END = 'session_end'
+EYE_CLOSED = 'eye_closed'
+EYE_OPEN = 'eye_open'
+YAWN_START = 'yawn_start'
+YAWN_END = 'yawn_end'
+DROWSY_ONSET = 'drowsy_onset'
+DROWSY_END = 'drowsy_end'
+ALARM = 'alarm'
+HEARTBEAT = 'heartbeat'
+
+HEARTBEAT_INTERVAL = 1.0  # Seconds between low-rate score/EAR/MAR samples
+
+# Timestamps are unix seconds (REAL) so durations keep sub-second precision.
+# duration is set on events that close a state (eye_open, yawn_end, ...) and
+# on heartbeats, where it is the time since the previous heartbeat.
+CREATE_TABLE_SQL = '''CREATE TABLE IF NOT EXISTS session_events
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     session_id INTEGER,
+                     timestamp REAL,
+                     event TEXT,
+                     duration REAL,
+                     score INTEGER,
+                     ear REAL,
+                     mar REAL,
+                     FOREIGN KEY(session_id) REFERENCES sessions(id))'''
+
+INSERT_SQL = '''INSERT INTO session_events
+                (session_id, timestamp, event, duration, score, ear, mar)
+                VALUES (?, ?, ?, ?, ?, ?, ?)'''
+
+
+class SessionEventLog:
+    """Turns the per-frame detection state into a sparse list of events.
+
+    Rows are buffered in ``pending`` until ``flush`` writes them, so frames
+    that change nothing never touch the database.
+    """
+
+    def __init__(self, session_id, now=None, heartbeat_interval=HEARTBEAT_INTERVAL):
+        now = time.time() if now is None else now
+        self.session_id = session_id
+        self.heartbeat_interval = heartbeat_interval
+        self.pending = []
+        self.alarm_count = 0
+        self.started_at = now
+        self.last_heartbeat = now
+        self.eye_closed_since = None
+        self.yawn_since = None
+        self.drowsy_since = None
+        self._add(now, SESSION_START, None, 0, 0.0, 0.0)
+
+    def _add(self, now, event, duration, score, ear, mar):
+        self.pending.append((self.session_id, now, event, duration, score, ear, mar))
+
+    def update(self, now, eye_closed, yawning, drowsy, score, ear, mar):
+        # Each (since, flag, start, end) pair is a two-state machine; only
+        # the transitions are recorded.
+        if eye_closed and self.eye_closed_since is None:
+            self.eye_closed_since = now
+            self._add(now, EYE_CLOSED, None, score, ear, mar)
+        elif not eye_closed and self.eye_closed_since is not None:
+            self._add(now, EYE_OPEN, now - self.eye_closed_since, score, ear, mar)
+            self.eye_closed_since = None
+
+        if yawning and self.yawn_since is None:
+            self.yawn_since = now
+            self._add(now, YAWN_START, None, score, ear, mar)
+        elif not yawning and self.yawn_since is not None:
+            self._add(now, YAWN_END, now - self.yawn_since, score, ear, mar)
+            self.yawn_since = None
+
+        if drowsy and self.drowsy_since is None:
+            self.drowsy_since = now
+            self._add(now, DROWSY_ONSET, None, score, ear, mar)
+        elif not drowsy and self.drowsy_since is not None:
+            self._add(now, DROWSY_END, now - self.drowsy_since, score, ear, mar)
+            self.drowsy_since = None
+
+        # Heartbeats land on the first frame past the interval, so at low
+        # frame rates the gaps are longer; the real gap is recorded
+        if now - self.last_heartbeat >= self.heartbeat_interval:
+            self._add(now, HEARTBEAT, now - self.last_heartbeat, score, ear, mar)
+            self.last_heartbeat = now
+
+    def alarm(self, now, score, ear, mar):
+        self.alarm_count += 1
+        self._add(now, ALARM, None, score, ear, mar)
+
+    def close(self, now, score, ear, mar):
+        # Close any open states so every episode has a duration
+        self.update(now, False, False, False, score, ear, mar)
+        self._add(now, SESSION_END, now - self.started_at, score, ear, mar)
+
+    def take_pending(self):
+        # Hands the buffered rows over, e.g. to db.BackgroundWriter
+        rows, self.pending = self.pending, []
+        return rows
+
+    def flush(self, conn):
+        rows = self.take_pending()
+        if rows:
+            conn.executemany(INSERT_SQL, rows)
+        return len(rows)
+
+
+def load_events(conn, session_id):
+    c = conn.cursor()
+    c.execute('''SELECT timestamp, event, duration, score, ear, mar
+                 FROM session_events WHERE session_id=?
+                 ORDER BY timestamp, id''', (session_id,))
+    return c.fetchall()
+
+
+def rebuild_timeline(conn, session_id, step=1.0):
+    """Rebuild a regularly sampled timeline from the stored events.
+
+    Returns one dict per ``step`` seconds with the eye/mouth/overall status
+    in effect and the most recent score, EAR and MAR sample.
+    """
+    events = load_events(conn, session_id)
+    if not events:
+        return []
+
+    start = events[0][0]
+    end = events[-1][0]
+    timeline = []
+    state = {'eye_status': 'Open', 'mouth_status': 'Closed', 'overall_status': 'Awake',
+             'score': 0, 'ear': 0.0, 'mar': 0.0}
+    i = 0
+    t = start
+    while t <= end:
+        while i < len(events) and events[i][0] <= t:
+            _, event, _, score, ear, mar = events[i]
+            if event == EYE_CLOSED:
+                state['eye_status'] = 'Closed'
+            elif event == EYE_OPEN:
+                state['eye_status'] = 'Open'
+            elif event == YAWN_START:
+                state['mouth_status'] = 'Yawning'
+            elif event == YAWN_END:
+                state['mouth_status'] = 'Closed'
+            elif event == DROWSY_ONSET:
+                state['overall_status'] = 'Drowsy'
+            elif event == DROWSY_END:
+                state['overall_status'] = 'Awake'
+            state['score'], state['ear'], state['mar'] = score, ear, mar
+            i += 1
+        entry = dict(state)
+        entry['offset'] = t - start
+        entry['timestamp'] = t
+        timeline.append(entry)
+        t += step
+    return timeline
+
+
+def session_aggregates(conn, session_id):
+    """Session summary computed from the event log alone.
+
+    The average score is time-weighted: each sample holds until the next
+    one. The maximum is taken over the recorded samples, so a short peak
+    between two heartbeats can be missed.
+    """
+    events = load_events(conn, session_id)
+    result = {'max_score': 0, 'avg_score': 0.0, 'duration': 0.0, 'drowsy_seconds': 0.0,
+              'eye_closed_seconds': 0.0, 'yawn_count': 0, 'alarm_count': 0}
+    if not events:
+        return result
+
+    weighted = 0.0
+    for (t, event, duration, score, _, _), nxt in zip(events, events[1:] + [None]):
+        score = score or 0
+        result['max_score'] = max(result['max_score'], score)
+        if nxt is not None:
+            weighted += score * (nxt[0] - t)
+        if event == DROWSY_END:
+            result['drowsy_seconds'] += duration or 0.0
+        elif event == EYE_OPEN:
+            result['eye_closed_seconds'] += duration or 0.0
+        elif event == YAWN_END:
+            result['yawn_count'] += 1
+        elif event == ALARM:
+            result['alarm_count'] += 1
+
+    result['duration'] = events[-1][0] - events[0][0]
+    if result['duration'] > 0:
+        result['avg_score'] = weighted / result['duration']
+    else:
+        result['avg_score'] = float(events[-1][3] or 0)
+    return result
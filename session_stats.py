@@ -0,0 +1,103 @@
+import math
+
+# Scores are small non-negative ints, so a unit-width histogram gives exact
+# quantiles up to HISTOGRAM_SIZE - 1; anything above lands in the last bin.
+HISTOGRAM_SIZE = 256
+
+# Extra per-session columns written by stop_detection, added by migration
+SESSION_STATS_COLUMNS = [
+    ('min_score', 'INTEGER'),
+    ('score_stddev', 'REAL'),
+    ('p50_score', 'REAL'),
+    ('p95_score', 'REAL'),
+    ('drowsy_seconds', 'REAL'),
+    ('alarm_count', 'INTEGER'),
+    ('frame_count', 'INTEGER'),
+]
+
+
+def migrate_sessions_table(cursor):
+    cursor.execute("PRAGMA table_info(sessions)")
+    existing = {row[1] for row in cursor.fetchall()}
+    for name, col_type in SESSION_STATS_COLUMNS:
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE sessions ADD COLUMN {name} {col_type}")
+
+
+class StreamingStats:
+    """Constant-memory count/sum/min/max/variance/quantiles of a score stream."""
+
+    def __init__(self, histogram_size=HISTOGRAM_SIZE):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.histogram = [0] * histogram_size
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+        # Welford's online variance
+        delta = value - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (value - self._mean)
+
+        index = min(max(int(value), 0), len(self.histogram) - 1)
+        self.histogram[index] += 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def variance(self):
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def stddev(self):
+        return math.sqrt(self.variance)
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = 0
+        for value, n in enumerate(self.histogram):
+            seen += n
+            if seen > rank:
+                # The overflow bin only knows its values are >= its index
+                if value == len(self.histogram) - 1:
+                    return float(self.max)
+                return float(value)
+        return float(self.max)
+
+
+class SessionStats:
+    """Score distribution for one session.
+
+    Drowsy time and alarm count come from the event log instead
+    (session_events.session_aggregates), which sees every frame.
+    """
+
+    def __init__(self):
+        self.scores = StreamingStats()
+
+    def observe(self, score):
+        self.scores.add(score)
+
+    def summary(self):
+        s = self.scores
+        return {
+            'max_score': s.max if s.count else 0,
+            'avg_score': s.mean,
+            'min_score': s.min if s.count else 0,
+            'score_stddev': s.stddev,
+            'p50_score': s.quantile(0.5),
+            'p95_score': s.quantile(0.95),
+            'frame_count': s.count,
+        }
@@ -0,0 +1,111 @@
+import argparse
+import os
+import random
+import xml.etree.ElementTree as ET
+
+import cv2
+import dlib
+
+import landmarks
+
+DATASET_PATH = "yawn_eye_dataset_new"
+TRAIN_XML = 'eye_mouth_train.xml'
+TEST_XML = 'eye_mouth_test.xml'
+TEST_FRACTION = 0.1
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# Smaller and shallower than the stock 68-point model: 32 points, fewer
+# cascades and a smaller feature pool keep both file size and per-face
+# latency down. Training is CPU only and uses every core.
+TRAINING_OPTIONS = {
+    'cascade_depth': 10,
+    'tree_depth': 4,
+    'num_trees_per_cascade_level': 500,
+    'nu': 0.1,
+    'oversampling_amount': 10,
+    'feature_pool_size': 400,
+    'num_test_splits': 20,
+}
+
+
+def iter_images(dataset_path):
+    for root, _, files in os.walk(dataset_path):
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(root, name)
+
+
+def label_images(dataset_path, detector, predictor):
+    # The full 68-point model acts as the teacher: its eye and mouth points
+    # become the ground truth for the trimmed model
+    samples = []
+    for image_path in iter_images(dataset_path):
+        gray = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            continue
+        faces = detector(gray)
+        if len(faces) == 0:
+            continue
+        face = faces[0]
+        shape = landmarks.shape_to_np(predictor(gray, face))
+        points = shape[landmarks.EYE_MOUTH_POINTS]
+        samples.append((image_path, face, points))
+    return samples
+
+
+def write_dataset_xml(samples, path):
+    # dlib's imglab format, as read by train_shape_predictor
+    dataset = ET.Element('dataset')
+    images = ET.SubElement(dataset, 'images')
+    for image_path, face, points in samples:
+        image = ET.SubElement(images, 'image', file=os.path.abspath(image_path))
+        box = ET.SubElement(image, 'box', top=str(face.top()), left=str(face.left()),
+                            width=str(face.width()), height=str(face.height()))
+        for i, (x, y) in enumerate(points):
+            ET.SubElement(box, 'part', name=f'{i:02d}', x=str(int(x)), y=str(int(y)))
+    ET.ElementTree(dataset).write(path)
+
+
+def train(train_xml, output_path, num_threads=None):
+    options = dlib.shape_predictor_training_options()
+    for name, value in TRAINING_OPTIONS.items():
+        setattr(options, name, value)
+    options.num_threads = num_threads or os.cpu_count() or 1
+    options.be_verbose = True
+    dlib.train_shape_predictor(train_xml, output_path, options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train a 32-point eye/mouth shape predictor")
+    parser.add_argument('--dataset', default=DATASET_PATH)
+    parser.add_argument('--output', default=landmarks.EYE_MOUTH_PREDICTOR_PATH)
+    parser.add_argument('--threads', type=int, default=None)
+    args = parser.parse_args()
+
+    detector = dlib.get_frontal_face_detector()
+    try:
+        teacher, _ = landmarks.load_predictor(landmarks.FULL_PREDICTOR_PATH)
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        return
+
+    samples = label_images(args.dataset, detector, teacher)
+    if not samples:
+        print(f"No faces found in {args.dataset}")
+        return
+    random.Random(42).shuffle(samples)
+    n_test = max(1, int(len(samples) * TEST_FRACTION))
+    write_dataset_xml(samples[n_test:], TRAIN_XML)
+    write_dataset_xml(samples[:n_test], TEST_XML)
+    print(f"Labelled {len(samples)} faces ({len(samples) - n_test} train, {n_test} test)")
+
+    train(TRAIN_XML, args.output, args.threads)
+
+    # Mean point error against the teacher's landmarks
+    print("Training error:", dlib.test_shape_predictor(TRAIN_XML, args.output))
+    print("Testing error:", dlib.test_shape_predictor(TEST_XML, args.output))
+    print(f"Saved {args.output}; select it with {landmarks.PREDICTOR_ENV}=eye_mouth")
+
+
+if __name__ == "__main__":
+    main()